@@ -0,0 +1,7 @@
+"""Run the pydomkeys command line, see pydomkeys.cli."""
+
+import sys
+
+from pydomkeys.cli import main
+
+sys.exit(main())
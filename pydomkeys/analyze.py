@@ -0,0 +1,295 @@
+"""A library for domain entity key generation identifiers.
+
+This module analyzes large key files, e.g. a Redis export of hundreds of millions of keys,
+before a reshard.  The file is memory-mapped and scanned in chunks that each worker maps for
+itself, optionally across a process pool, so keys are never read line by line into strings.
+
+Files are either newline-delimited (one txkey or route key per line, CRLF line ends are fine) or
+fixed-width records of back-to-back keys.  With numpy installed, chunks whose lines all have
+the same length are decoded column-wise in numpy; anything else is scanned key by key.
+
+The report has the key counts, the invalid key count (wrong length, non-hex route or a digit
+outside the alphabet), the route histogram and per-shard counts of the route keys for a
+shard count and strategy, the first and last timestamps and the keys created in each hour.
+
+Examples:
+--------
+    >>> import tempfile
+    >>> from pydomkeys.analyze import analyze
+    >>> from pydomkeys.keys import KeyGen
+    >>> keygen = KeyGen.create("US", 4)
+    >>> with tempfile.NamedTemporaryFile("w", suffix=".txt") as tmp:
+    ...     for key in [*keygen.route_keys(1_000), "bad-key"]:
+    ...         print(key, file=tmp)
+    ...     tmp.flush()
+    ...     report = analyze(tmp.name, shard_count=4)
+    >>> report["route_keys"], report["invalid"], sum(report["shards"].values())
+    (1000, 1, 1000)
+
+Print the report as json from the command line with:
+
+    $ python -m pydomkeys analyze keys.txt --shards 8 --processes 4
+
+The module contains the following functions:
+- `analyze(path, shard_count)` - scan a key file and return the report as a dict
+- `chunk_ranges(path, chunk_size, width)` - the record aligned (start, end) byte ranges of a file
+"""
+
+import mmap
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Optional
+
+from pydomkeys.base62 import DEFAULT_ALPHABET, NOT_DIGIT, TIMESTAMP_WIDTH, digit_table
+from pydomkeys.keys import EPOCH, ROUTE_KEY_LENGTH, TXKEY_LENGTH
+from pydomkeys.shards import HEX_ROUTES, NIBBLES, NOT_HEX, ROUTE_COUNT, ROUTE_OFFSET, shard_table
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+HOUR_MICROS = 3_600_000_000
+CHUNK_SIZE = 1 << 24
+RETURN = 0x0D
+
+
+def chunk_ranges(path: str | Path, chunk_size: int = CHUNK_SIZE, width: Optional[int] = None) -> list[tuple[int, int]]:
+    """Return the (start, end) byte ranges of about chunk_size bytes that cover the file.
+
+    Ranges end just past a newline, or on a record boundary for fixed-width files, so no key
+    is split between chunks.
+    """
+    with Path(path).open("rb") as src:
+        size = src.seek(0, 2)
+        if size == 0:
+            return []
+
+        if width is not None:
+            step = max(chunk_size // width, 1) * width
+            return [(start, min(start + step, size)) for start in range(0, size, step)]
+
+        with mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            ranges = []
+            start = 0
+            while start < size:
+                end = mm.find(b"\n", min(start + chunk_size, size) - 1)
+                end = size if end < 0 else end + 1
+                ranges.append((start, end))
+                start = end
+
+            return ranges
+
+
+def _empty() -> dict[str, Any]:
+    """Return the counts of an empty scan."""
+    return {
+        "txkeys": 0,
+        "route_keys": 0,
+        "invalid": 0,
+        "routes": [0] * ROUTE_COUNT,
+        "timestamp_min": None,
+        "timestamp_max": None,
+        "hours": {},
+    }
+
+
+def _merge(total: dict[str, Any], part: dict[str, Any]) -> dict[str, Any]:
+    """Add the counts of part into total and return total."""
+    for name in ("txkeys", "route_keys", "invalid"):
+        total[name] += part[name]
+
+    total["routes"] = [a + b for a, b in zip(total["routes"], part["routes"], strict=True)]
+
+    for name, pick in (("timestamp_min", min), ("timestamp_max", max)):
+        if part[name] is not None:
+            total[name] = part[name] if total[name] is None else pick(total[name], part[name])
+
+    hours = total["hours"]
+    for hour, count in part["hours"].items():
+        hours[hour] = hours.get(hour, 0) + count
+
+    return total
+
+
+def _uniform_width(data: bytes) -> Optional[tuple[int, int]]:
+    """Return the (key length, record stride) when every line of the chunk has the same length, else None."""
+    first = data.find(b"\n")
+    if first < 0:
+        return None
+
+    stride = first + 1
+    records = len(data) // stride
+    if len(data) % stride or data.count(b"\n", first) != records or data[first::stride].count(b"\n") != records:
+        return None
+
+    length = first
+    if first and data[first - 1] == RETURN:
+        if data[first - 1 :: stride].count(b"\r") != records:
+            return None
+        length -= 1
+
+    return length, stride
+
+
+def _scan_numpy(data: bytes, length: int, stride: int, digits: bytes, radix: int) -> dict[str, Any]:
+    """Return the counts for a chunk of keys of one length at a fixed stride using numpy columns."""
+    part = _empty()
+    if length not in (TXKEY_LENGTH, ROUTE_KEY_LENGTH):
+        part["invalid"] = len(data) // stride
+        return part
+
+    raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, stride)
+    offset = length - TXKEY_LENGTH
+    values = np.frombuffer(digits, dtype=np.uint8)[raw[:, offset:length]]
+    valid = (values != NOT_DIGIT).all(axis=1)
+
+    if length == ROUTE_KEY_LENGTH:
+        nibbles = np.frombuffer(NIBBLES, dtype=np.uint8)
+        high = nibbles[raw[:, ROUTE_OFFSET]]
+        low = nibbles[raw[:, ROUTE_OFFSET + 1]]
+        valid &= (high != NOT_HEX) & (low != NOT_HEX)
+        routes = (high[valid].astype(np.intp) << 4) | low[valid]
+        part["routes"] = np.bincount(routes, minlength=ROUTE_COUNT).tolist()
+
+    count = int(valid.sum())
+    part["invalid"] = len(valid) - count
+    part["route_keys" if length == ROUTE_KEY_LENGTH else "txkeys"] = count
+
+    if count:
+        micros = np.zeros(count, dtype=np.int64)
+        for column in values[valid, :TIMESTAMP_WIDTH].T:
+            micros = micros * radix + column
+
+        part["timestamp_min"] = int(micros.min())
+        part["timestamp_max"] = int(micros.max())
+        hours, counts = np.unique(micros // HOUR_MICROS, return_counts=True)
+        part["hours"] = dict(zip(hours.tolist(), counts.tolist(), strict=True))
+
+    return part
+
+
+def _scan_keys(keys: list[bytes], digits: bytes, radix: int) -> dict[str, Any]:
+    """Return the counts for a list of keys, checking each one."""
+    part = _empty()
+    routes, hours = part["routes"], part["hours"]
+    low_stamp = high_stamp = None
+
+    for key in keys:
+        length = len(key)
+        if length == ROUTE_KEY_LENGTH:
+            high, low = NIBBLES[key[ROUTE_OFFSET]], NIBBLES[key[ROUTE_OFFSET + 1]]
+            if NOT_HEX in (high, low):
+                part["invalid"] += 1
+                continue
+        elif length != TXKEY_LENGTH:
+            part["invalid"] += 1
+            continue
+
+        values = key[length - TXKEY_LENGTH :].translate(digits)
+        if NOT_DIGIT in values:
+            part["invalid"] += 1
+            continue
+
+        micros = 0
+        for value in values[:TIMESTAMP_WIDTH]:
+            micros = micros * radix + value
+
+        if length == ROUTE_KEY_LENGTH:
+            routes[(high << 4) | low] += 1
+            part["route_keys"] += 1
+        else:
+            part["txkeys"] += 1
+
+        hour = micros // HOUR_MICROS
+        hours[hour] = hours.get(hour, 0) + 1
+        if low_stamp is None or micros < low_stamp:
+            low_stamp = micros
+        if high_stamp is None or micros > high_stamp:
+            high_stamp = micros
+
+    part["timestamp_min"], part["timestamp_max"] = low_stamp, high_stamp
+
+    return part
+
+
+def _scan(task: tuple[str, int, int, Optional[int], str]) -> dict[str, Any]:
+    """Map the file and return the counts for the keys in one (path, start, end, width, alphabet) chunk."""
+    path, start, end, width, alphabet = task
+    digits = digit_table(alphabet)
+
+    with Path(path).open("rb") as src, mmap.mmap(src.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        data = mm[start:end]
+
+    if width is not None:
+        records = len(data) // width
+        part = _empty()
+        if np is not None and records:
+            part = _scan_numpy(data[: records * width], width, width, digits, len(alphabet))
+        elif records:
+            keys = [data[pos : pos + width] for pos in range(0, records * width, width)]
+            part = _scan_keys(keys, digits, len(alphabet))
+
+        part["invalid"] += int(len(data) % width > 0)
+        return part
+
+    if np is not None:
+        layout = _uniform_width(data)
+        if layout is not None:
+            return _scan_numpy(data, *layout, digits, len(alphabet))
+
+    keys = [line.rstrip(b"\r") for line in data.split(b"\n")]
+    return _scan_keys([key for key in keys if key], digits, len(alphabet))
+
+
+def analyze(  # noqa: PLR0913
+    path: str | Path,
+    shard_count: int = 1,
+    strategy: str = "modulo",
+    *,
+    width: Optional[int] = None,
+    chunk_size: int = CHUNK_SIZE,
+    processes: Optional[int] = None,
+    alphabet: str = DEFAULT_ALPHABET,
+) -> dict[str, Any]:
+    """Scan the key file in chunks and return the report as a dict.
+
+    Pass width for a file of back-to-back fixed-width keys, otherwise the file holds one key per
+    line.  With processes greater than one the chunks are scanned by a process pool; each worker
+    maps the file itself so only the chunk offsets and counts cross process boundaries.
+    """
+    table = shard_table(shard_count, strategy)
+    tasks = [(str(path), start, end, width, alphabet) for start, end in chunk_ranges(path, chunk_size, width)]
+
+    total = _empty()
+    if processes is not None and processes > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for part in executor.map(_scan, tasks):
+                _merge(total, part)
+    else:
+        for task in tasks:
+            _merge(total, _scan(task))
+
+    shards = dict.fromkeys(range(shard_count), 0)
+    for route, count in enumerate(total["routes"]):
+        shards[table[route]] += count
+
+    low, high = total["timestamp_min"], total["timestamp_max"]
+    return {
+        "path": str(path),
+        "keys": total["txkeys"] + total["route_keys"],
+        "txkeys": total["txkeys"],
+        "route_keys": total["route_keys"],
+        "invalid": total["invalid"],
+        "routes": {HEX_ROUTES[route]: count for route, count in enumerate(total["routes"]) if count},
+        "shards": shards,
+        "timestamp_min": low,
+        "timestamp_max": high,
+        "first": None if low is None else (EPOCH + timedelta(microseconds=low)).isoformat(),
+        "last": None if high is None else (EPOCH + timedelta(microseconds=high)).isoformat(),
+        "hours": {
+            (EPOCH + timedelta(hours=hour)).isoformat(): count for hour, count in sorted(total["hours"].items())
+        },
+    }
+
@@ -0,0 +1,18 @@
+from pathlib import Path
+from typing import Any, Optional
+
+HOUR_MICROS: int
+CHUNK_SIZE: int
+RETURN: int
+
+def chunk_ranges(path: str | Path, chunk_size: int = ..., width: Optional[int] = ...) -> list[tuple[int, int]]: ...
+def analyze(
+    path: str | Path,
+    shard_count: int = ...,
+    strategy: str = ...,
+    *,
+    width: Optional[int] = ...,
+    chunk_size: int = ...,
+    processes: Optional[int] = ...,
+    alphabet: str = ...,
+) -> dict[str, Any]: ...
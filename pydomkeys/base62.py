@@ -9,14 +9,52 @@ Examples:
     >>> base62 = Base62()
     >>> base62.encode(123456789)
     '8M0kX'
+    >>> base62.encode_fixed(123456789, 5)
+    '8M0kX'
+    >>> base62.encode_timestamp(1697654321123456)
+    '7m49gxWkq'
+    >>> base62.decode('8M0kX')
+    123456789
+    >>> list(base62.decode_many(['8M0kX', '7m49gxWkq']))
+    [123456789, 1697654321123456]
 
 Author: darryl.west
 Date: 2023-08-26
 """
 
 import string
+from collections.abc import Iterable, Iterator
+from functools import cache
 
 DEFAULT_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
+TIMESTAMP_WIDTH = 9
+COUNTER_WIDTH = 3
+NOT_DIGIT = 0xFF
+
+
+@cache
+def pair_table(alphabet: str) -> tuple[str, ...]:
+    """Return the table of all two digit encodings for the alphabet; built once per alphabet."""
+    return tuple(hi + lo for hi in alphabet for lo in alphabet)
+
+
+@cache
+def index_table(alphabet: str) -> dict[str, int]:
+    """Return the digit to value reverse lookup for the alphabet; built once per alphabet."""
+    return {char: idx for idx, char in enumerate(alphabet)}
+
+
+@cache
+def pair_index_table(alphabet: str) -> dict[str, int]:
+    """Return the two digit to value reverse lookup for the alphabet; built once per alphabet."""
+    return {pair: idx for idx, pair in enumerate(pair_table(alphabet))}
+
+
+@cache
+def digit_table(alphabet: str) -> bytes:
+    """Return the bytes.translate table of ascii byte to digit value, NOT_DIGIT for bytes not in the alphabet."""
+    index = index_table(alphabet)
+    return bytes(index.get(chr(b), NOT_DIGIT) for b in range(256))
 
 
 class Base62:
@@ -24,9 +62,27 @@ class Base62:
     alternate alphabets to get diffent encodings.
     """
 
+    __slots__ = (
+        "alphabet",
+        "counter_range",
+        "index",
+        "pair_index",
+        "pairs",
+        "radix",
+        "radix2",
+        "timestamp_range",
+    )
+
     def __init__(self, alphabet: str = DEFAULT_ALPHABET):
         """Initialize the alphabet or use the default."""
         self.alphabet = alphabet
+        self.radix = len(alphabet)
+        self.pairs = pair_table(alphabet)
+        self.index = index_table(alphabet)
+        self.pair_index = pair_index_table(alphabet)
+        self.radix2 = self.radix * self.radix
+        self.timestamp_range = range(self.radix ** (TIMESTAMP_WIDTH - 1), self.radix**TIMESTAMP_WIDTH)
+        self.counter_range = range(self.radix2, self.radix**COUNTER_WIDTH)
 
     def __repr__(self):
         """Return the current base62 alphabet."""
@@ -51,7 +107,75 @@ class Base62:
         key = "".join(base)
         return key
 
-    # TODO(dpw): implement decode
-    def decode(self, _b62: str) -> int:
-        """Decode the base62 encoded string and return the int."""
-        return 0
+    def encode_fixed(self, number: int, width: int) -> str:
+        """Encode the number with two digit table lookups when it encodes to exactly width digits.
+
+        Numbers outside the width's range fall back to encode so the output always matches encode.
+        """
+        radix = self.radix
+        if not radix ** (width - 1) <= number < radix**width:
+            return self.encode(number)
+
+        pairs, radix2 = self.pairs, self.radix2
+
+        key = ""
+        if width & 1:
+            number, idx = divmod(number, radix)
+            key = self.alphabet[idx]
+
+        for _ in range(width >> 1):
+            number, idx = divmod(number, radix2)
+            key = pairs[idx] + key
+
+        return key
+
+    def encode_timestamp(self, number: int) -> str:
+        """Encode a microsecond timestamp, 9 digits for dates between 2000 and 2390, with four divmods."""
+        if number not in self.timestamp_range:
+            return self.encode(number)
+
+        pairs, radix2 = self.pairs, self.radix2
+        number, a = divmod(number, radix2)
+        number, b = divmod(number, radix2)
+        number, c = divmod(number, radix2)
+        number, d = divmod(number, radix2)
+
+        return self.alphabet[number] + pairs[d] + pairs[c] + pairs[b] + pairs[a]
+
+    def encode_counter(self, number: int) -> str:
+        """Encode a 3 digit counter value with a single divmod."""
+        if number not in self.counter_range:
+            return self.encode(number)
+
+        number, idx = divmod(number, self.radix)
+
+        return self.pairs[number] + self.alphabet[idx]
+
+    def decode(self, b62: str) -> int:
+        """Decode the base62 encoded string and return the int; raise ValueError on digits not in the alphabet."""
+        index, radix = self.index, self.radix
+        number = 0
+
+        try:
+            for char in b62:
+                number = number * radix + index[char]
+        except KeyError as err:
+            msg = f"invalid base62 digit {err} in {b62!r}"
+            raise ValueError(msg) from None
+
+        return number
+
+    def decode_many(self, keys: Iterable[str]) -> Iterator[int]:
+        """Decode each base62 string in keys, yielding ints as the iterable is consumed."""
+        index, radix = self.index, self.radix
+
+        for b62 in keys:
+            number = 0
+            try:
+                for char in b62:
+                    number = number * radix + index[char]
+            except KeyError as err:
+                msg = f"invalid base62 digit {err} in {b62!r}"
+                raise ValueError(msg) from None
+
+            yield number
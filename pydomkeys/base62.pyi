@@ -1,9 +1,30 @@
+from collections.abc import Iterable, Iterator
+
 from _typeshed import Incomplete
 
 DEFAULT_ALPHABET: Incomplete
+TIMESTAMP_WIDTH: int
+COUNTER_WIDTH: int
+NOT_DIGIT: int
+
+def pair_table(alphabet: str) -> tuple[str, ...]: ...
+def index_table(alphabet: str) -> dict[str, int]: ...
+def pair_index_table(alphabet: str) -> dict[str, int]: ...
+def digit_table(alphabet: str) -> bytes: ...
 
 class Base62:
     alphabet: Incomplete
+    radix: int
+    pairs: tuple[str, ...]
+    index: dict[str, int]
+    pair_index: dict[str, int]
+    radix2: int
+    timestamp_range: range
+    counter_range: range
     def __init__(self, alphabet: str = ...) -> None: ...
     def encode(self, number: int) -> str: ...
-    def decode(self, _b62: str) -> int: ...
+    def encode_fixed(self, number: int, width: int) -> str: ...
+    def encode_timestamp(self, number: int) -> str: ...
+    def encode_counter(self, number: int) -> str: ...
+    def decode(self, b62: str) -> int: ...
+    def decode_many(self, keys: Iterable[str]) -> Iterator[int]: ...
@@ -0,0 +1,246 @@
+"""A library for domain entity key generation identifiers.
+
+This module is the `python -m pydomkeys` (or `pydomkeys`) command line.  Every subcommand
+streams its input and output in fixed size chunks through large buffered writes, so memory
+stays flat on multi-gigabyte key files:
+
+    $ python -m pydomkeys gen 10000000 --domain US --shards 8 -o keys.txt
+    $ python -m pydomkeys route --shards 8 --keys < keys.txt
+    $ python -m pydomkeys route --shards 8 --split shards/ -i keys.txt
+    $ python -m pydomkeys decode --iso < keys.txt
+    $ python -m pydomkeys analyze keys.txt --shards 8 --processes 4
+    $ python -m pydomkeys lease --unix /tmp/pydomkeys.sock
+
+Input is one key per line; blank lines are skipped.
+
+The module contains the following functions:
+- `main(args)` - parse the arguments, run the subcommand and return the exit status
+"""
+
+import argparse
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack, nullcontext
+from itertools import islice
+from pathlib import Path
+from typing import IO, Optional
+
+from pydomkeys import __version__
+from pydomkeys.analyze import CHUNK_SIZE as ANALYZE_CHUNK_SIZE
+from pydomkeys.analyze import analyze
+from pydomkeys.keys import DomainRouter, KeyGen
+from pydomkeys.lease import LeaseServer
+from pydomkeys.shards import STRATEGIES, bucket_routes, parse_routes, shard_table
+
+BUFFER_SIZE = 1 << 20
+CHUNK_SIZE = 65_536
+
+
+def _positive(value: str) -> int:
+    """Return the argument as an int; reject anything below 1."""
+    number = int(value)
+    if number < 1:
+        msg = f"must be at least 1, not {number}"
+        raise argparse.ArgumentTypeError(msg)
+
+    return number
+
+
+def _open(path: Optional[str], mode: str, stream: IO[str]):
+    """Return a context for the buffered file at path, or for the standard stream when path is - or None."""
+    if path is None or path == "-":
+        return nullcontext(stream)
+
+    return Path(path).open(mode, buffering=BUFFER_SIZE)
+
+
+def _lines(lines: Iterable[str]) -> Iterator[str]:
+    """Yield the stripped, non-blank lines."""
+    for line in lines:
+        key = line.strip()
+        if key:
+            yield key
+
+
+def _chunks(keys: Iterable[str], size: int) -> Iterator[list[str]]:
+    """Yield lists of up to size keys."""
+    keys = iter(keys)
+    while chunk := list(islice(keys, size)):
+        yield chunk
+
+
+def gen(opts: argparse.Namespace) -> int:
+    """Write count route keys, or txkeys, one per line in batches."""
+    keygen = KeyGen.create(opts.domain, opts.shards, strategy=opts.strategy)
+    generate = keygen.txkeys if opts.txkey else keygen.route_keys
+
+    with _open(opts.output, "w", sys.stdout) as out:
+        remaining = opts.count
+        while remaining > 0:
+            size = min(remaining, opts.batch)
+            out.write("\n".join(generate(size)))
+            out.write("\n")
+            remaining -= size
+
+    return 0
+
+
+def route(opts: argparse.Namespace) -> int:
+    """Write the shard number of each key, or split the keys into one file per shard."""
+    table = shard_table(opts.shards, opts.strategy)
+
+    with _open(opts.input, "r", sys.stdin) as src:
+        keys = _lines(src)
+
+        if opts.split:
+            directory = Path(opts.split)
+            directory.mkdir(parents=True, exist_ok=True)
+
+            with ExitStack() as stack:
+                files: dict[int, IO[str]] = {}
+                for buckets in bucket_routes(keys, table, opts.batch):
+                    for shard, shard_keys in buckets.items():
+                        out = files.get(shard)
+                        if out is None:
+                            path = directory / f"shard-{shard}.txt"
+                            out = files[shard] = stack.enter_context(path.open("w", buffering=BUFFER_SIZE))
+
+                        out.write("\n".join(shard_keys))
+                        out.write("\n")
+
+            return 0
+
+        with _open(opts.output, "w", sys.stdout) as out:
+            for chunk in _chunks(keys, opts.batch):
+                shards = parse_routes(chunk, table)
+                if opts.keys:
+                    out.write("\n".join(f"{key}\t{shard}" for key, shard in zip(chunk, shards, strict=True)))
+                else:
+                    out.write("\n".join(map(str, shards)))
+                out.write("\n")
+
+    return 0
+
+
+def decode(opts: argparse.Namespace) -> int:
+    """Write the microsecond timestamp, or UTC iso datetime, of each txkey or route key."""
+    keygen = KeyGen(DomainRouter("", 1))
+
+    with _open(opts.input, "r", sys.stdin) as src, _open(opts.output, "w", sys.stdout) as out:
+        for chunk in _chunks(_lines(src), opts.batch):
+            stamps = keygen.parse_timestamps(chunk, as_datetime=opts.iso)
+            values = [stamp.isoformat() for stamp in stamps] if opts.iso else list(map(str, stamps))
+            if opts.keys:
+                out.write("\n".join(f"{key}\t{value}" for key, value in zip(chunk, values, strict=True)))
+            else:
+                out.write("\n".join(values))
+            out.write("\n")
+
+    return 0
+
+
+def report(opts: argparse.Namespace) -> int:
+    """Write the analyzer report for a key file as json."""
+    result = analyze(
+        opts.path,
+        opts.shards,
+        opts.strategy,
+        width=opts.width,
+        chunk_size=opts.chunk_size,
+        processes=opts.processes,
+    )
+
+    with _open(opts.output, "w", sys.stdout) as out:
+        json.dump(result, out, indent=2)
+        out.write("\n")
+
+    return 0
+
+
+def lease(opts: argparse.Namespace) -> int:
+    """Run the counter lease server until interrupted."""
+    server = LeaseServer(opts.min, opts.max, opts.block_size)
+    address = opts.unix if opts.unix else (opts.host, opts.port)
+    print(f"pydomkeys lease server on {address}: {server}", file=sys.stderr)
+
+    try:
+        server.run(address)
+    except KeyboardInterrupt:
+        pass
+
+    return 0
+
+
+def parser() -> argparse.ArgumentParser:
+    """Return the argument parser with the gen, route, decode, analyze and lease subcommands."""
+    cli = argparse.ArgumentParser(prog="pydomkeys", description="generate, route and decode domain keys")
+    cli.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = cli.add_subparsers(dest="command", required=True)
+
+    cmd = commands.add_parser("gen", help="stream route keys or txkeys")
+    cmd.add_argument("count", type=int, help="number of keys to generate")
+    cmd.add_argument("-d", "--domain", default="US", help="two character domain, default US")
+    cmd.add_argument("-s", "--shards", type=int, default=1, help="shard count used by the key generator")
+    cmd.add_argument("--strategy", choices=STRATEGIES, default="modulo", help="route to shard strategy")
+    cmd.add_argument("--txkey", action="store_true", help="generate 12 character txkeys instead of route keys")
+    cmd.add_argument("-o", "--output", help="output file, default stdout")
+    cmd.add_argument("--batch", type=_positive, default=CHUNK_SIZE, help="keys generated per write")
+    cmd.set_defaults(run=gen)
+
+    cmd = commands.add_parser("route", help="shard numbers for route keys read one per line")
+    cmd.add_argument("-s", "--shards", type=int, required=True, help="shard count")
+    cmd.add_argument("--strategy", choices=STRATEGIES, default="modulo", help="route to shard strategy")
+    cmd.add_argument("-i", "--input", help="input file, default stdin")
+    cmd.add_argument("-o", "--output", help="output file, default stdout")
+    cmd.add_argument("--keys", action="store_true", help="write key<TAB>shard lines")
+    cmd.add_argument("--split", metavar="DIR", help="write the keys to DIR/shard-N.txt instead of shard numbers")
+    cmd.add_argument("--batch", type=_positive, default=CHUNK_SIZE, help="keys read per chunk")
+    cmd.set_defaults(run=route)
+
+    cmd = commands.add_parser("decode", help="timestamps of txkeys or route keys read one per line")
+    cmd.add_argument("-i", "--input", help="input file, default stdin")
+    cmd.add_argument("-o", "--output", help="output file, default stdout")
+    cmd.add_argument("--iso", action="store_true", help="write UTC iso datetimes instead of microseconds")
+    cmd.add_argument("--keys", action="store_true", help="write key<TAB>timestamp lines")
+    cmd.add_argument("--batch", type=_positive, default=CHUNK_SIZE, help="keys read per chunk")
+    cmd.set_defaults(run=decode)
+
+    cmd = commands.add_parser("analyze", help="route, shard and time distribution of a key file as json")
+    cmd.add_argument("path", help="newline-delimited or fixed-width key file")
+    cmd.add_argument("-s", "--shards", type=int, default=1, help="shard count for the per-shard counts")
+    cmd.add_argument("--strategy", choices=STRATEGIES, default="modulo", help="route to shard strategy")
+    cmd.add_argument("--width", type=int, help="key width of a file of back-to-back keys without newlines")
+    cmd.add_argument("--chunk-size", type=_positive, default=ANALYZE_CHUNK_SIZE, help="bytes scanned per chunk")
+    cmd.add_argument("-p", "--processes", type=int, help="scan the chunks with a pool of this many processes")
+    cmd.add_argument("-o", "--output", help="output file, default stdout")
+    cmd.set_defaults(run=report)
+
+    cmd = commands.add_parser("lease", help="serve counter block leases to LeasedCounter clients")
+    cmd.add_argument("--unix", metavar="PATH", help="listen on this unix socket instead of tcp")
+    cmd.add_argument("--host", default="127.0.0.1", help="tcp host, default 127.0.0.1")
+    cmd.add_argument("--port", type=int, default=7620, help="tcp port, default 7620")
+    cmd.add_argument("--min", type=int, default=3_850, help="first count of the shared range")
+    cmd.add_argument("--max", type=int, default=238_000, help="last count of the shared range")
+    cmd.add_argument("--block-size", type=int, default=1_024, help="counts per lease")
+    cmd.set_defaults(run=lease)
+
+    return cli
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    """Run the command line and return the exit status; invalid keys report an error and return 1."""
+    opts = parser().parse_args(args)
+
+    try:
+        return opts.run(opts)
+    except ValueError as err:
+        print(f"pydomkeys: error: {err}", file=sys.stderr)
+        return 1
+    except BrokenPipeError:
+        # the reader went away (e.g. piped to head); send the rest of the output to devnull so
+        # the final flush at exit does not fail again
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
@@ -0,0 +1,13 @@
+import argparse
+from typing import Optional
+
+BUFFER_SIZE: int
+CHUNK_SIZE: int
+
+def gen(opts: argparse.Namespace) -> int: ...
+def route(opts: argparse.Namespace) -> int: ...
+def decode(opts: argparse.Namespace) -> int: ...
+def report(opts: argparse.Namespace) -> int: ...
+def lease(opts: argparse.Namespace) -> int: ...
+def parser() -> argparse.ArgumentParser: ...
+def main(args: Optional[list[str]] = ...) -> int: ...
@@ -18,25 +18,87 @@ Examples:
 The module contains the following functions:
 - `txkey()` - Returns a 12 character base62 txkey
 - `route_key()` - Returns a 16 character base62 txkey
+- `txkeys(n)` - Returns a list of n 12 character base62 txkeys
+- `route_keys(n)` - Returns a list of n 16 character base62 route keys
+- `compile()` - Returns a route key function with the generator's state bound to locals
+- `parse_routes(keys)` - Returns the shard numbers for a list, buffer or numpy array of route keys
+- `parse_timestamp(key)` - Returns the microsecond timestamp of a txkey or route key
+- `parse_datetime(key)` - Returns the UTC datetime of a txkey or route key
+- `parse_timestamps(keys)` - Streams the timestamps (or datetimes) of many keys
+- `key_range(start, end)` - Returns the min/max txkeys for a time window
+- `is_valid_route_key(key, strict)` - Checks a route key, strictly with the hex route, alphabet and timestamp
+- `is_valid_many(keys)` / `filter_valid(keys)` - Streams the strict validation of many keys
+- `route_key_ranges(start, end)` - Returns the min/max route keys of a time window for each route
+- `pack_txkey(key)` / `unpack_txkey(n)` - Converts a txkey to and from a 72 bit int
+- `pack_route_key(key)` / `unpack_route_key(b)` - Converts a route key to and from 12 bytes
+- `pack_route_keys(keys)` / `unpack_route_keys(buffer)` - Bulk route key packing to and from a bytearray
 
 Author: darryl.west
 Date: 2023-08-26
 """
 
+import itertools
+import re
 import string
+import threading
 import time
-from random import randint
-from typing import Optional, Self
+from collections.abc import Callable, Iterable, Iterator
+from datetime import UTC, datetime, timedelta
+from functools import cache
+from pathlib import Path
+from random import randbytes, randint
+from typing import Any, Optional, Self
 
-from pydomkeys.base62 import Base62
+from pydomkeys.base62 import COUNTER_WIDTH, TIMESTAMP_WIDTH, Base62
+from pydomkeys.metrics import KeyMetrics
+from pydomkeys.shards import HEX_ROUTES, bucket_routes, parse_routes, shard_table
+from pydomkeys.state import CounterState
 
 DEFAULT_ALPHABET = string.digits + string.ascii_uppercase + string.ascii_lowercase
 ROUTE_KEY_LENGTH = 16
+TXKEY_LENGTH = 12
+TXKEY_BYTES = 9
+ROUTE_KEY_BYTES = 12
+EPOCH = datetime(1970, 1, 1, tzinfo=UTC)
+
+# the plausible timestamps for strict validation: 2000-01-01 UTC up to an hour ahead of this clock
+MIN_TIMESTAMP = 946_684_800_000_000
+MAX_CLOCK_SKEW = 3_600_000_000
+WINDOW_REFRESH = 60_000_000
+
+
+def _timestamp_offset(key: str) -> int:
+    """Return the offset of the 9 character timestamp in a txkey or route key."""
+    if len(key) == ROUTE_KEY_LENGTH:
+        return ROUTE_KEY_LENGTH - TXKEY_LENGTH
+
+    if len(key) == TXKEY_LENGTH:
+        return 0
+
+    msg = f"key {key!r} is neither a {TXKEY_LENGTH} character txkey nor a {ROUTE_KEY_LENGTH} character route key"
+    raise ValueError(msg)
+
+
+@cache
+def route_key_pattern(alphabet: str, domain: str) -> re.Pattern:
+    """Return the compiled route key pattern, domain + hex route + 12 alphabet digits; built once per pair."""
+    digits = "".join(re.escape(char) for char in alphabet)
+    return re.compile(f"{re.escape(domain)}[0-9a-fA-F]{{2}}[{digits}]{{{TXKEY_LENGTH}}}")
+
+
+def _micros(moment: datetime) -> int:
+    """Return the microseconds since the epoch for the datetime; naive datetimes are treated as UTC."""
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=UTC)
+
+    return (moment - EPOCH) // timedelta(microseconds=1)
 
 
 class Counter:
     """Counter for sufix generation."""
 
+    __slots__ = ("count", "max", "min", "rollovers")
+
     def __init__(self, x_min: int = 3_850, x_max: int = 238_000, start: int = -1):
         """Initialize x_min to 3,850, x_max to 238,000, start value.
 
@@ -48,6 +110,7 @@ class Counter:
             start = randint(x_min, x_max)
 
         self.count = start
+        self.rollovers = 0
 
     def __repr__(self):
         """Show the current count, min and max."""
@@ -59,53 +122,300 @@ class Counter:
         count = self.count + 1
         if count > self.max:
             count = self.min
+            self.rollovers += 1
 
         self.count = count
 
         return count
 
+    def next_counts(self, size: int) -> list[int]:
+        """Return the next size counts as a list; rolls over to x_min exactly as next_count does."""
+        counts: list[int] = []
+        count = self.count
+        remaining = size
+
+        while remaining > 0:
+            if count >= self.max:
+                count = self.min - 1
+                self.rollovers += 1
+
+            stop = min(self.max, count + remaining)
+            counts.extend(range(count + 1, stop + 1))
+            remaining -= stop - count
+            count = stop
+
+        self.count = count
+
+        return counts
+
     def reset(self) -> int:
         """Reset the counter to minimum and return the value."""
         self.count = self.min
         return self.count
 
+    def span(self) -> int:
+        """Return the number of distinct counts before the counter rolls over."""
+        return self.max - self.min + 1
+
+    def rollover_count(self) -> int:
+        """Return the number of times the counter has rolled over to x_min."""
+        return self.rollovers
+
+    @classmethod
+    def for_worker(cls, worker_id: int, worker_count: int, x_min: int = 3_850, x_max: int = 238_000) -> Self:
+        """Create a counter over worker_id's share of x_min..x_max when it is split between worker_count workers.
+
+        Workers with distinct ids never share counts, so keys are collision free across all
+        workers without any coordination.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import Counter
+            >>> counter = Counter.for_worker(3, 32)
+            >>> counter.min, counter.max
+            (25801, 33117)
+
+        """
+        if not 0 <= worker_id < worker_count:
+            msg = f"worker id {worker_id} must be in the range 0..{worker_count - 1}"
+            raise ValueError(msg)
+
+        size = (x_max - x_min + 1) // worker_count
+        if size < 1:
+            msg = f"can not split the range {x_min}..{x_max} between {worker_count} workers"
+            raise ValueError(msg)
+
+        lo = x_min + worker_id * size
+        hi = x_max if worker_id == worker_count - 1 else lo + size - 1
+
+        return cls(lo, hi)
+
+
+class StripedCounter(Counter):
+    """Thread safe counter that gives each thread its own stripe of the x_min..x_max range.
+
+    Threads never share counts while there are no more threads than stripes, so two threads
+    can not produce the same suffix in the same microsecond.  Each stripe has its own lock
+    that is only contended when threads outnumber stripes and have to share one.
+    """
+
+    __slots__ = ("_assigned", "_local", "_lock", "stripes")
+
+    def __init__(self, x_min: int = 3_850, x_max: int = 238_000, stripes: int = 64):
+        """Initialize the x_min, x_max range and split it into stripes sub-ranges."""
+        super().__init__(x_min, x_max, x_min)
+
+        size = (x_max - x_min + 1) // stripes
+        if size < 1:
+            msg = f"can not split the range {x_min}..{x_max} into {stripes} stripes"
+            raise ValueError(msg)
+
+        bounds = [(x_min + n * size, x_min + (n + 1) * size - 1) for n in range(stripes)]
+        bounds[-1] = (bounds[-1][0], x_max)
+
+        self.stripes = [(Counter(lo, hi), threading.Lock()) for lo, hi in bounds]
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._assigned = 0
+
+    def __repr__(self):
+        """Show the min, max and number of stripes."""
+        return f"min: {self.min}, max: {self.max}, stripes: {len(self.stripes)}"
+
+    def _stripe(self) -> tuple[Counter, threading.Lock]:
+        """Return the calling thread's stripe, assigning the next one round-robin on first use."""
+        try:
+            return self._local.stripe
+        except AttributeError:
+            with self._lock:
+                stripe = self.stripes[self._assigned % len(self.stripes)]
+                self._assigned += 1
+
+            self._local.stripe = stripe
+            return stripe
+
+    def next_count(self) -> int:
+        """Increment the calling thread's stripe count and return it."""
+        counter, lock = self._stripe()
+        with lock:
+            self.count = counter.next_count()
+            return self.count
+
+    def next_counts(self, size: int) -> list[int]:
+        """Return the next size counts from the calling thread's stripe."""
+        counter, lock = self._stripe()
+        with lock:
+            counts = counter.next_counts(size)
+            self.count = counts[-1] if counts else self.count
+            return counts
+
+    def reset(self) -> int:
+        """Reset every stripe to its minimum and return the counter minimum."""
+        for counter, lock in self.stripes:
+            with lock:
+                counter.reset()
+
+        self.count = self.min
+        return self.count
+
+    def span(self) -> int:
+        """Return the size of the smallest stripe, the counts a thread gets before rolling over."""
+        return min(counter.span() for counter, _ in self.stripes)
+
+    def rollover_count(self) -> int:
+        """Return the number of times any stripe has rolled over."""
+        return sum(counter.rollovers for counter, _ in self.stripes)
+
+
+class RouteGenerator:
+    """Buffered route generator that draws random bytes in bulk and maps them to two character hex routes.
+
+    Each byte of the buffer is uniformly distributed over the 256 routes, and the hex text comes
+    from the precomputed HEX_ROUTES table rather than formatting each route.  The byte source
+    defaults to random.randbytes; pass os.urandom or any other callable(size) -> bytes to change it.
+
+    Examples:
+    --------
+        >>> from pydomkeys.keys import DomainRouter, RouteGenerator
+        >>> router = DomainRouter("US", 4, route_generator=RouteGenerator())
+        >>> route = router.route()
+        >>> assert int(route, 16) < 256
+
+    """
+
+    __slots__ = ("_routes", "buffer_size", "source")
+
+    def __init__(self, buffer_size: int = 4_096, source: Callable[[int], bytes] = randbytes):
+        """Initialize the buffer size and random byte source; the first call fills the buffer."""
+        self.buffer_size = buffer_size
+        self.source = source
+        self._routes: Iterator[str] = iter(())
+
+    def __repr__(self):
+        """Show the buffer size and byte source."""
+        return f"buffer size: {self.buffer_size}, source: {self.source.__name__}"
+
+    def __call__(self) -> str:
+        """Return the next buffered route, refilling the buffer when it runs dry."""
+        try:
+            return next(self._routes)
+        except StopIteration:
+            self._routes = map(HEX_ROUTES.__getitem__, self.source(self.buffer_size))
+            return next(self._routes)
+
+    def routes(self, size: int) -> list[str]:
+        """Return a list of size routes drawn directly from the byte source."""
+        return [HEX_ROUTES[b] for b in self.source(size)]
+
 
 class DomainRouter:
     """Domain Router class used to generate domain and route prefix for route_key."""
 
-    def __init__(self, domain: str, shard_count: int):
-        """Initialise DomainRouter with a two character domain label and optional route-generator."""
+    __slots__ = ("_shard_count", "_strategy", "domain_key", "max_route_size", "route_generator", "shard_table")
+
+    def __init__(
+        self,
+        domain: str,
+        shard_count: int,
+        route_generator: Optional[RouteGenerator] = None,
+        strategy: str | Callable[[int], tuple[int, ...]] = "modulo",
+    ):
+        """Initialise DomainRouter with a two character domain label and optional route-generator.
+
+        The strategy maps the 256 routes to shards, see pydomkeys.shards for the named strategies
+        (modulo, range, jump, balanced); a callable(shard_count) returning a 256 entry table also works.
+        The shard_table is rebuilt whenever shard_count or strategy is changed.
+        """
         self.domain_key = domain
         self.max_route_size = 255
-        self.shard_count = shard_count
+        self.route_generator = route_generator
+        self._shard_count = shard_count
+        self._strategy = strategy
+        self.shard_table = shard_table(shard_count, strategy)
 
     def __repr__(self):
         """Show the domain key."""
         return f"domain key: {self.domain_key}, shards: {self.shard_count}"
 
+    @property
+    def shard_count(self) -> int:
+        """Return the number of shards the routes map to."""
+        return self._shard_count
+
+    @shard_count.setter
+    def shard_count(self, shard_count: int) -> None:
+        """Set the number of shards and rebuild the shard table."""
+        self.shard_table = shard_table(shard_count, self._strategy)
+        self._shard_count = shard_count
+
+    @property
+    def strategy(self) -> str | Callable[[int], tuple[int, ...]]:
+        """Return the route to shard strategy."""
+        return self._strategy
+
+    @strategy.setter
+    def strategy(self, strategy: str | Callable[[int], tuple[int, ...]]) -> None:
+        """Set the route to shard strategy and rebuild the shard table."""
+        self.shard_table = shard_table(self._shard_count, strategy)
+        self._strategy = strategy
+
     def domain(self) -> str:
         """Return the domain key, usually two characters."""
         return self.domain_key
 
     def route(self) -> str:
         """Return the random routing/shard key, usually two characters 00 through ff for one of 256 routes."""
+        if self.route_generator is not None:
+            return self.route_generator()
+
         return f"{randint(0, self.max_route_size):02x}"
 
+    def routes(self, size: int) -> list[str]:
+        """Return a list of size random routes drawn from a single block of random bytes."""
+        if self.route_generator is not None:
+            return self.route_generator.routes(size)
+
+        return [HEX_ROUTES[b] for b in randbytes(size)]
+
 
 class KeyGen:
     """KeyGen class used to generate txkey and route_key."""
 
+    __slots__ = (
+        "_last",
+        "_last_lock",
+        "_stamp",
+        "_window",
+        "base62",
+        "counter",
+        "domain_router",
+        "metrics",
+        "monotonic",
+        "state",
+    )
+
     def __init__(
         self,
         domain_router: DomainRouter,
         base62: Optional[Base62] = None,
         counter: Optional[Counter] = None,
+        monotonic: bool = False,
+        state: Optional[CounterState] = None,
     ):
         """Initialize the base62 worker and counter.
 
         The default constructor creates Base62 and Counter instances in thier
         default states.  See those modules for ways to change the alphabet or
         min/max counter ranges.
+
+        With monotonic set every txkey (and the txkey part of every route key) is strictly
+        greater than the one before it from this generator, at any rate and even when the
+        wall clock steps backwards.  Keys within the same microsecond, or after a clock
+        regression, borrow forward from the last issued (timestamp, count) instead of sleeping.
+        The counter must produce 3 digit counts, as the default range does, for keys to sort.
+
+        With a state the last (timestamp, count) is checkpointed to its file and a generator
+        created over a saved state resumes past it, see resume.
         """
         self.domain_router = domain_router
         base62 = Base62() if base62 is None else base62
@@ -116,14 +426,49 @@ class KeyGen:
         self.base62 = base62
         self.counter = counter
 
+        # the (bucket, prefix) of the last encoded timestamp; see encode_timestamp
+        self._stamp = (-1, "")
+
+        # the (expires, bounds) of the strict validation timestamp window; see timestamp_window
+        self._window: tuple[int, Any] = (-1, None)
+
+        # opt-in instrumentation, see enable_metrics
+        self.metrics: Optional[KeyMetrics] = None
+
+        # the last (timestamp, count) issued in monotonic mode
+        self.monotonic = monotonic
+        self._last = (-1, counter.min)
+        self._last_lock = threading.Lock()
+
+        # the persisted high-water mark, see pydomkeys.state
+        self.state = state
+        if state is not None and state.saved is not None:
+            self.resume(*state.saved)
+
     def __repr__(self):
         """Show the domain router, base62 and counter objects."""
         return f"router: {self.domain_router}, base62: {self.base62}, counter: {self.counter}"
 
     @classmethod
-    def create(cls, domain: str, shard_count: Optional[int] = None) -> Self:
+    def create(  # noqa: PLR0913
+        cls,
+        domain: str,
+        shard_count: Optional[int] = None,
+        worker_id: Optional[int] = None,
+        worker_count: Optional[int] = None,
+        *,
+        strategy: str = "modulo",
+        monotonic: bool = False,
+        state: Optional[str | Path] = None,
+    ) -> Self:
         """Create a standard KeyGen instance with the given domain string.
 
+        The strategy names the route to shard mapping used by parse_route; see pydomkeys.shards.
+        Set monotonic for strictly increasing keys, see KeyGen.
+        Pass a state file path to persist the high-water mark and resume past it on restart.
+        Pass worker_id and worker_count to give each process (e.g. each gunicorn worker on each
+        host) its own partition of the counter range; see Counter.for_worker.
+
         Examples:
         --------
             >>> from pydomkeys.keys import KeyGen
@@ -136,21 +481,128 @@ class KeyGen:
             238000
             >>> key = keygen.route_key()
             >>> assert len(key)
+            >>> worker = KeyGen.create("CG", worker_id=0, worker_count=32)
+            >>> worker.counter.min, worker.counter.max
+            (3850, 11166)
 
         """
         shard_count = 1 if shard_count is None else shard_count
-        return cls(DomainRouter(domain, shard_count))
+
+        counter = None
+        if worker_id is not None or worker_count is not None:
+            if worker_id is None or worker_count is None:
+                msg = "worker_id and worker_count must be used together"
+                raise ValueError(msg)
+
+            counter = Counter.for_worker(worker_id, worker_count)
+
+        router = DomainRouter(domain, shard_count, strategy=strategy)
+        saved = None if state is None else CounterState(state)
+
+        return cls(router, counter=counter, monotonic=monotonic, state=saved)
+
+    def resume(self, timestamp: int, count: int, interval: int) -> None:
+        """Move past a saved (timestamp, count) high-water mark that was checkpointed every interval keys.
+
+        Up to interval keys may have been issued after the checkpoint, so a plain Counter skips
+        interval counts past the saved count, and monotonic mode starts interval microseconds
+        above the saved timestamp: every monotonic key can move the timestamp on by one
+        microsecond (txkeys(1) always does), so that is as far as those keys could have reached.
+        Wall clock time is still trusted for keys issued long after the checkpoint.
+        """
+        counter = self.counter
+        span = counter.span()
+        if type(counter) is Counter and counter.min <= count <= counter.max:
+            counter.count = counter.min + (count + interval - counter.min) % span
+
+        with self._last_lock:
+            floor = timestamp + interval
+            if floor > self._last[0]:
+                self._last = (floor, counter.max)
+
+    def enable_metrics(self) -> KeyMetrics:
+        """Turn on the key metrics, keeping any already collected, and return them."""
+        if self.metrics is None:
+            self.metrics = KeyMetrics()
+
+        return self.metrics
+
+    def disable_metrics(self) -> None:
+        """Turn off the key metrics; generation is back to a single is None check per key."""
+        self.metrics = None
+
+    def snapshot(self) -> dict:
+        """Return the metrics and counter rollovers as a plain dict, with the domain and per-shard counts.
+
+        Without enable_metrics only the domain and counter rollovers are reported.
+        """
+        rollovers = self.counter.rollover_count()
+        if self.metrics is None:
+            snapshot = {"counter_rollovers": rollovers}
+        else:
+            snapshot = self.metrics.snapshot(self.domain_router.shard_table, rollovers)
+
+        return {"domain": self.domain_router.domain(), **snapshot}
+
+    def encode_timestamp(self, milliseconds: int) -> str:
+        """Encode the microsecond timestamp, re-using the cached high-order prefix when possible.
+
+        Only the last two base62 digits move between calls within the same 3,844 microsecond
+        bucket, so the prefix is encoded once per bucket and the tail is a pair table lookup.
+        """
+        bucket, low = divmod(milliseconds, self.base62.radix2)
+
+        cached, prefix = self._stamp
+        if bucket != cached:
+            if bucket == 0:
+                return self.base62.encode(milliseconds)
+
+            prefix = self.base62.encode(bucket)
+            self._stamp = (bucket, prefix)
+
+        return prefix + self.base62.pairs[low]
+
+    def next_stamp(self, milliseconds: int) -> tuple[int, int]:
+        """Return the next strictly increasing (timestamp, count) for monotonic mode.
+
+        A timestamp past the last one takes the next count from the counter.  Otherwise the
+        last timestamp is re-used with the next count, and when that count would pass the
+        counter's max the timestamp is borrowed forward by one microsecond.
+        """
+        counter = self.counter
+        with self._last_lock:
+            last, count = self._last
+            if milliseconds > last:
+                count = counter.next_count()
+            else:
+                milliseconds, count = last, count + 1
+                if count > counter.max:
+                    milliseconds, count = last + 1, counter.min
+
+            self._last = (milliseconds, count)
+
+        return milliseconds, count
 
     def txkey(self, milliseconds: Optional[int] = None):
         """Generate a new 12 character txkey with the current counter."""
         milliseconds = time.time_ns() // 1_000 if milliseconds is None else milliseconds
 
+        if self.metrics is not None:
+            self.metrics.record(milliseconds)
+
+        if self.monotonic:
+            milliseconds, num = self.next_stamp(milliseconds)
+        else:
+            num = self.counter.next_count()
+
+        if self.state is not None:
+            self.state.record(milliseconds, num)
+
         # get the microsecond time stamp and encode to base 64
-        key = self.base62.encode(milliseconds)
+        key = self.encode_timestamp(milliseconds)
 
         # now fill in the next 3 random numbers
-        num = self.counter.next_count()
-        suffix = self.base62.encode(num)
+        suffix = self.base62.encode_counter(num)
 
         return f"{key}{suffix}"
 
@@ -177,17 +629,339 @@ class KeyGen:
         prefix = self.domain_router.domain()
         route = self.domain_router.route()
 
+        if self.metrics is not None:
+            self.metrics.record_route(route)
+
         return f"{prefix}{route}{key}"
 
-    def is_valid_route_key(self, key: str) -> bool:
-        """Return true if the key is a valid route key."""
-        return (
-            isinstance(key, str)
-            and len(key) == ROUTE_KEY_LENGTH
-            and key.startswith(
-                self.domain_router.domain(),
-            )
-        )
+    def compile(self) -> Callable[[], str]:
+        """Return a route key function with the generator's state bound to locals.
+
+        The function reads the clock once per key, keeps its own timestamp prefix cache and, for a
+        plain Counter with 3 digit counts, steps and encodes the count inline.  It shares the counter
+        with this KeyGen so keys from both stay unique; routes come from the router's route generator,
+        or a new buffered RouteGenerator for a plain DomainRouter.  Compile again after changing the
+        router, counter range or alphabet.  Monotonic, metrics and state generators return route_key itself;
+        that check is made only here, so turning on monotonic, metrics or state after compiling is
+        silently ignored by the returned function until compile is called again.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US", 4)
+            >>> route_key = keygen.compile()
+            >>> key = route_key()
+            >>> assert len(key) == 16 and keygen.is_valid_route_key(key)
+
+        """
+        if self.monotonic or self.metrics is not None or self.state is not None:
+            return self.route_key
+
+        base62, counter, router = self.base62, self.counter, self.domain_router
+        clock = time.time_ns
+        encode, encode_counter, next_count = base62.encode, base62.encode_counter, counter.next_count
+        alphabet, pairs, radix, radix2 = base62.alphabet, base62.pairs, base62.radix, base62.radix2
+        x_min, x_max = counter.min, counter.max
+        inline = type(counter) is Counter and x_min >= radix2 and x_max < radix2 * radix
+
+        domain = router.domain()
+        if router.route_generator is not None:
+            route = router.route_generator
+        elif type(router) is DomainRouter:
+            route = RouteGenerator()
+        else:
+            route = router.route
+
+        stamp = (-1, "")
+
+        def route_key() -> str:
+            nonlocal stamp
+            bucket, low = divmod(clock() // 1_000, radix2)
+            cached, head = stamp
+            if bucket != cached:
+                head = encode(bucket)
+                stamp = (bucket, head)
+
+            if inline:
+                count = counter.count + 1
+                if count > x_max:
+                    count = x_min
+                    counter.rollovers += 1
+                counter.count = count
+                high, idx = divmod(count, radix)
+                suffix = pairs[high] + alphabet[idx]
+            else:
+                suffix = encode_counter(next_count())
+
+            return domain + route() + head + pairs[low] + suffix
+
+        return route_key
+
+    def txkeys(self, size: int, out: Optional[list[str]] = None) -> list[str]:
+        """Generate a batch of size txkeys, optionally filling the preallocated out list.
+
+        The clock is read and encoded once per batch tick.  A tick holds at most one full
+        pass of the counter range so every (timestamp, counter) pair in the batch is unique;
+        larger batches read the clock again and never reuse a timestamp from the same batch.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US")
+            >>> keys = keygen.txkeys(1_000)
+            >>> assert len(set(keys)) == 1_000
+            >>> assert all(len(key) == 12 for key in keys)
+
+        """
+        if out is not None and len(out) < size:
+            msg = f"buffer size {len(out)} is smaller than the batch size {size}"
+            raise ValueError(msg)
+
+        encode_timestamp = self.encode_timestamp
+        encode_counter = self.base62.encode_counter
+        span = self.counter.span()
+
+        keys: list[str] = []
+        last = -1
+        while len(keys) < size:
+            milliseconds = time.time_ns() // 1_000
+            chunk = min(span, size - len(keys))
+
+            if self.monotonic:
+                # start a fresh timestamp past the last issued key; each rollover within the
+                # counts moves the rest of the chunk on a microsecond to keep the keys increasing
+                with self._last_lock:
+                    milliseconds = max(milliseconds, self._last[0] + 1)
+                    runs = _ascending_runs(self.counter.next_counts(chunk))
+                    self._last = (milliseconds + len(runs) - 1, runs[-1][-1])
+            else:
+                if milliseconds <= last:
+                    milliseconds = last + 1
+                last = milliseconds
+                runs = [self.counter.next_counts(chunk)]
+
+            for counts in runs:
+                prefix = encode_timestamp(milliseconds)
+                keys.extend([prefix + encode_counter(num) for num in counts])
+
+                if self.metrics is not None:
+                    self.metrics.record(milliseconds, len(counts))
+
+                if self.state is not None:
+                    self.state.record(milliseconds, counts[-1], len(counts))
+
+                milliseconds += 1
+
+        if out is None:
+            return keys
+
+        out[:size] = keys
+        return out
+
+    def route_keys(self, size: int, out: Optional[list[str]] = None) -> list[str]:
+        """Generate a batch of size route keys, optionally filling the preallocated out list.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US", 4)
+            >>> keys = keygen.route_keys(1_000)
+            >>> assert len(set(keys)) == 1_000
+            >>> assert all(len(key) == 16 and key.startswith("US") for key in keys)
+
+        """
+        prefix = self.domain_router.domain()
+        routes = self.domain_router.routes(size)
+        if self.metrics is not None:
+            self.metrics.record_routes(routes)
+        keys = [prefix + route + key for route, key in zip(routes, self.txkeys(size), strict=True)]
+
+        if out is None:
+            return keys
+
+        out[:size] = keys
+        return out
+
+    def parse_timestamp(self, key: str) -> int:
+        """Return the microsecond timestamp from a 12 character txkey or a 16 character route key.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US")
+            >>> keygen.parse_timestamp(keygen.route_key(1697654321123456))
+            1697654321123456
+            >>> keygen.parse_datetime(keygen.txkey(1697654321123456))
+            datetime.datetime(2023, 10, 18, 18, 38, 41, 123456, tzinfo=datetime.timezone.utc)
+
+        """
+        offset = _timestamp_offset(key)
+        return self.base62.decode(key[offset : offset + TIMESTAMP_WIDTH])
+
+    def parse_datetime(self, key: str) -> datetime:
+        """Return the UTC datetime from a 12 character txkey or a 16 character route key."""
+        return EPOCH + timedelta(microseconds=self.parse_timestamp(key))
+
+    def parse_timestamps(self, keys: Iterable[str], as_datetime: bool = False) -> Iterator[int | datetime]:
+        """Stream the microsecond timestamps (or UTC datetimes when as_datetime is set) of txkeys and route keys.
+
+        Keys generated close together share the leading seven timestamp digits, so the decoded
+        prefix is cached and only the last two digits are looked up for each key.  Datetime
+        objects are only created when asked for.
+        """
+        decode, pair_index, radix2 = self.base62.decode, self.base62.pair_index, self.base62.radix2
+        prefix_width = TIMESTAMP_WIDTH - 2
+
+        last_prefix, last_value = "", 0
+        for key in keys:
+            offset = _timestamp_offset(key)
+            prefix = key[offset : offset + prefix_width]
+            if prefix != last_prefix:
+                last_value = decode(prefix) * radix2
+                last_prefix = prefix
+
+            try:
+                micros = last_value + pair_index[key[offset + prefix_width : offset + TIMESTAMP_WIDTH]]
+            except KeyError:
+                msg = f"invalid base62 timestamp in key {key!r}"
+                raise ValueError(msg) from None
+
+            yield EPOCH + timedelta(microseconds=micros) if as_datetime else micros
+
+    def key_range(self, start: datetime, end: datetime) -> tuple[str, str]:
+        """Return the inclusive (min, max) txkey bounds for keys created in the window start <= t < end.
+
+        Txkeys start with the fixed width timestamp, so a time window is a lexicographic key range
+        that can be used for redis ZRANGEBYLEX (with [ bounds) or SQL BETWEEN scans.  Naive
+        datetimes are treated as UTC.  The alphabet must be in sorted order for the bounds to hold.
+
+        Examples:
+        --------
+            >>> from datetime import datetime
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US")
+            >>> keygen.key_range(datetime(2023, 10, 18, 18), datetime(2023, 10, 18, 19))
+            ('7m479sKVk000', '7m4B5VYxrzzz')
+
+        """
+        alphabet = self.base62.alphabet
+        if list(alphabet) != sorted(alphabet):
+            msg = f"key ranges need a sorted alphabet, not {alphabet!r}"
+            raise ValueError(msg)
+
+        first, last = _micros(start), _micros(end) - 1
+        if last < first:
+            msg = f"the window end {end} must be after the start {start}"
+            raise ValueError(msg)
+
+        encode_fixed = self.base62.encode_fixed
+        lo = encode_fixed(first, TIMESTAMP_WIDTH) + alphabet[0] * COUNTER_WIDTH
+        hi = encode_fixed(last, TIMESTAMP_WIDTH) + alphabet[-1] * COUNTER_WIDTH
+
+        return lo, hi
+
+    def route_key_ranges(self, start: datetime, end: datetime) -> list[tuple[str, str]]:
+        """Return the inclusive (min, max) route key bounds of the window start <= t < end for each of the 256 routes.
+
+        Route keys lead with the domain and route, so each route is its own contiguous range; the
+        list is indexed by route number.
+        """
+        lo, hi = self.key_range(start, end)
+        prefix = self.domain_router.domain()
+
+        return [(prefix + route + lo, prefix + route + hi) for route in HEX_ROUTES]
+
+    def timestamp_window(self) -> tuple[Any, Any, Optional[Callable[[str], int]]]:
+        """Return the (low, high, decode) bounds of a plausible key timestamp for strict validation.
+
+        Timestamps from MIN_TIMESTAMP up to MAX_CLOCK_SKEW ahead of the clock are plausible.  With a
+        sorted alphabet the bounds are encoded so the 9 timestamp digits compare as text and decode
+        is None; otherwise the bounds are ints and decode converts the digits.  The window is
+        cached and moves forward once a minute.
+        """
+        now = time.time_ns() // 1_000
+        expires, window = self._window
+        if now < expires:
+            return window
+
+        base62 = self.base62
+        low, high = MIN_TIMESTAMP, now + MAX_CLOCK_SKEW
+        if list(base62.alphabet) == sorted(base62.alphabet):
+            window = (base62.encode_fixed(low, TIMESTAMP_WIDTH), base62.encode_fixed(high, TIMESTAMP_WIDTH), None)
+        else:
+            window = (low, high, base62.decode)
+
+        self._window = (now + WINDOW_REFRESH, window)
+        return window
+
+    def is_valid_route_key(self, key: str, strict: bool = False) -> bool:
+        """Return true if the key is a valid route key.
+
+        The default check is the type, length and domain prefix.  With strict set the route must
+        also be two hex digits, the rest of the key digits of the alphabet and the timestamp
+        plausible, see timestamp_window; strict keys always parse with parse_route.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US")
+            >>> key = "USzz!!!!!!!!!!!!"
+            >>> keygen.is_valid_route_key(key), keygen.is_valid_route_key(key, strict=True)
+            (True, False)
+            >>> keygen.is_valid_route_key(keygen.route_key(), strict=True)
+            True
+
+        """
+        domain = self.domain_router.domain()
+        if not (isinstance(key, str) and len(key) == ROUTE_KEY_LENGTH and key.startswith(domain)):
+            return False
+
+        if not strict:
+            return True
+
+        if route_key_pattern(self.base62.alphabet, domain).fullmatch(key) is None:
+            return False
+
+        low, high, decode = self.timestamp_window()
+        offset = ROUTE_KEY_LENGTH - TXKEY_LENGTH
+        stamp = key[offset : offset + TIMESTAMP_WIDTH]
+
+        return low <= (stamp if decode is None else decode(stamp)) <= high
+
+    def is_valid_many(self, keys: Iterable[Any], strict: bool = True) -> Iterator[bool]:
+        """Stream is_valid_route_key for every key, strict by default, with the pattern and window looked up once."""
+        domain = self.domain_router.domain()
+        match = route_key_pattern(self.base62.alphabet, domain).fullmatch
+        start, stop = ROUTE_KEY_LENGTH - TXKEY_LENGTH, ROUTE_KEY_LENGTH - TXKEY_LENGTH + TIMESTAMP_WIDTH
+        low, high, decode = self.timestamp_window()
+
+        for count, key in enumerate(keys, 1):
+            if not (isinstance(key, str) and len(key) == ROUTE_KEY_LENGTH and key.startswith(domain)):
+                yield False
+            elif not strict:
+                yield True
+            elif match(key) is None:
+                yield False
+            else:
+                if not count % 4_096:
+                    low, high, decode = self.timestamp_window()
+                stamp = key[start:stop]
+                yield low <= (stamp if decode is None else decode(stamp)) <= high
+
+    def filter_valid(self, keys: Iterable[Any], strict: bool = True) -> Iterator[str]:
+        """Stream only the valid route keys, strict by default; see is_valid_many.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create("US")
+            >>> keys = keygen.route_keys(3)
+            >>> list(keygen.filter_valid(["USzz!!!!!!!!!!!!", keys[0], None, keys[1]])) == keys[:2]
+            True
+
+        """
+        keys, candidates = itertools.tee(keys)
+        return itertools.compress(keys, self.is_valid_many(candidates, strict))
 
     def parse_route(self, key: str) -> int:
         """Parse the route from the key and return the route number based on the number of shards.
@@ -207,4 +981,154 @@ class KeyGen:
         """
         route = int(key[2:4], 16)
 
-        return route % self.domain_router.shard_count
+        return self.domain_router.shard_table[route]
+
+    def parse_routes(self, keys: Any, width: int = ROUTE_KEY_LENGTH) -> Any:
+        """Parse the shard number of every key in a list, fixed-width bytes buffer or numpy S16 array.
+
+        Returns an array('H') of shard numbers, or a numpy uint16 array for numpy input; see
+        pydomkeys.shards.parse_routes.
+
+        Examples:
+        --------
+            >>> from pydomkeys.keys import KeyGen
+            >>> keygen = KeyGen.create(domain="US", shard_count=4)
+            >>> keys = keygen.route_keys(100)
+            >>> shards = keygen.parse_routes(keys)
+            >>> assert list(shards) == [keygen.parse_route(key) for key in keys]
+            >>> shards = keygen.parse_routes("".join(keys).encode())
+            >>> assert list(shards) == [keygen.parse_route(key) for key in keys]
+
+        """
+        return parse_routes(keys, self.domain_router.shard_table, width)
+
+    def bucket_routes(self, keys: Iterable[str], chunk_size: int = 65_536) -> Iterator[dict[int, list[str]]]:
+        """Stream the keys grouped into per-shard buckets, one dict of shard -> keys per chunk_size keys."""
+        return bucket_routes(keys, self.domain_router.shard_table, chunk_size)
+
+
+def _ascending_runs(counts: list[int]) -> list[list[int]]:
+    """Split the counts into strictly increasing runs, starting a new run at every rollover or jump back."""
+    if not counts or counts[-1] - counts[0] == len(counts) - 1:
+        return [counts]
+
+    runs, start = [], 0
+    for index in range(1, len(counts)):
+        if counts[index] <= counts[index - 1]:
+            runs.append(counts[start:index])
+            start = index
+
+    runs.append(counts[start:])
+    return runs
+
+
+_BASE62 = Base62()
+
+# lower case hex route -> its packed byte; unpacking always yields lower case, so only that packs
+_ROUTE_BYTES = {route: bytes((value,)) for value, route in enumerate(HEX_ROUTES)}
+
+
+def _route_byte(key: str) -> bytes:
+    """Return the packed route byte of the key; raise ValueError unless the route is lower case hex."""
+    try:
+        return _ROUTE_BYTES[key[2:4]]
+    except KeyError:
+        msg = f"route key {key!r} must have a lower case hex route"
+        raise ValueError(msg) from None
+
+
+def pack_txkey(key: str, base62: Optional[Base62] = None) -> int:
+    """Pack a 12 character txkey into an int of at most 72 bits (9 bytes).
+
+    The int is the base62 value of the whole key, so packed txkeys sort in the same order as
+    the keys themselves when the alphabet is sorted.
+
+    Examples:
+    --------
+        >>> from pydomkeys.keys import pack_txkey, unpack_txkey
+        >>> pack_txkey('7m49gxWkq1Zz')
+        404598559044711027643
+        >>> unpack_txkey(404598559044711027643)
+        '7m49gxWkq1Zz'
+
+    """
+    if len(key) != TXKEY_LENGTH:
+        msg = f"txkey {key!r} must be {TXKEY_LENGTH} characters"
+        raise ValueError(msg)
+
+    return (base62 or _BASE62).decode(key)
+
+
+def unpack_txkey(number: int, base62: Optional[Base62] = None) -> str:
+    """Unpack an int created by pack_txkey back to the 12 character txkey."""
+    return (base62 or _BASE62).encode_fixed(number, TXKEY_LENGTH)
+
+
+def pack_route_key(key: str, base62: Optional[Base62] = None) -> bytes:
+    """Pack a 16 character route key into 12 bytes: 2 domain bytes, 1 route byte and the 9 byte txkey.
+
+    The bytes are big-endian so packed keys sort like the keys.  Only lower case hex routes are
+    accepted, so unpacking always gives back the original key.
+
+    Examples:
+    --------
+        >>> from pydomkeys.keys import pack_route_key, unpack_route_key
+        >>> packed = pack_route_key('US4e7m49gxWkq1Zz')
+        >>> len(packed)
+        12
+        >>> unpack_route_key(packed)
+        'US4e7m49gxWkq1Zz'
+
+    """
+    if len(key) != ROUTE_KEY_LENGTH:
+        msg = f"route key {key!r} must be {ROUTE_KEY_LENGTH} characters"
+        raise ValueError(msg)
+
+    txkey = (base62 or _BASE62).decode(key[4:])
+    return key[:2].encode("ascii") + _route_byte(key) + txkey.to_bytes(TXKEY_BYTES, "big")
+
+
+def unpack_route_key(data: bytes | bytearray | memoryview, base62: Optional[Base62] = None) -> str:
+    """Unpack 12 bytes created by pack_route_key back to the 16 character route key."""
+    if len(data) != ROUTE_KEY_BYTES:
+        msg = f"packed route key must be {ROUTE_KEY_BYTES} bytes, not {len(data)}"
+        raise ValueError(msg)
+
+    txkey = (base62 or _BASE62).encode_fixed(int.from_bytes(data[3:], "big"), TXKEY_LENGTH)
+    return bytes(data[:2]).decode("ascii") + HEX_ROUTES[data[2]] + txkey
+
+
+def pack_route_keys(keys: Iterable[str], base62: Optional[Base62] = None) -> bytearray:
+    """Pack route keys back-to-back into a bytearray of 12 byte records."""
+    decode = (base62 or _BASE62).decode
+    buffer = bytearray()
+
+    for key in keys:
+        if len(key) != ROUTE_KEY_LENGTH:
+            msg = f"route key {key!r} must be {ROUTE_KEY_LENGTH} characters"
+            raise ValueError(msg)
+
+        buffer += key[:2].encode("ascii")
+        buffer += _route_byte(key)
+        buffer += decode(key[4:]).to_bytes(TXKEY_BYTES, "big")
+
+    return buffer
+
+
+def unpack_route_keys(buffer: bytes | bytearray | memoryview, base62: Optional[Base62] = None) -> Iterator[str]:
+    """Stream the route keys from a buffer of 12 byte records created by pack_route_keys."""
+    view = memoryview(buffer)
+    if len(view) % ROUTE_KEY_BYTES:
+        msg = f"buffer length {len(view)} is not a multiple of {ROUTE_KEY_BYTES} bytes"
+        raise ValueError(msg)
+
+    encode_fixed = (base62 or _BASE62).encode_fixed
+    from_bytes = int.from_bytes
+
+    for start in range(0, len(view), ROUTE_KEY_BYTES):
+        record = view[start : start + ROUTE_KEY_BYTES]
+        yield (
+            bytes(record[:2]).decode("ascii")
+            + HEX_ROUTES[record[2]]
+            + encode_fixed(from_bytes(record[3:], "big"), TXKEY_LENGTH)
+        )
@@ -1,14 +1,33 @@
-from typing import Optional, Self
+import re
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional, Self
 
 from _typeshed import Incomplete
 
 from .base62 import Base62 as Base62
+from .metrics import KeyMetrics as KeyMetrics
+from .state import CounterState as CounterState
 
 DEFAULT_ALPHABET: Incomplete
+ROUTE_KEY_LENGTH: int
+TXKEY_LENGTH: int
+TXKEY_BYTES: int
+ROUTE_KEY_BYTES: int
+EPOCH: datetime
+MIN_TIMESTAMP: int
+MAX_CLOCK_SKEW: int
+WINDOW_REFRESH: int
+HEX_ROUTES: tuple[str, ...]
 dflt_rng: Incomplete
 
+def route_key_pattern(alphabet: str, domain: str) -> re.Pattern: ...
+
 class Counter:
     count: Incomplete
+    rollovers: int
     def __init__(
         self,
         x_min: int = ...,
@@ -16,28 +35,96 @@ class Counter:
         start: int = ...,
     ) -> None: ...
     def next_count(self) -> int: ...
+    def next_counts(self, size: int) -> list[int]: ...
     def reset(self) -> int: ...
+    def span(self) -> int: ...
+    def rollover_count(self) -> int: ...
+    @classmethod
+    def for_worker(cls, worker_id: int, worker_count: int, x_min: int = ..., x_max: int = ...) -> Self: ...
+
+class StripedCounter(Counter):
+    stripes: list[tuple[Counter, threading.Lock]]
+    def __init__(self, x_min: int = ..., x_max: int = ..., stripes: int = ...) -> None: ...
+
+class RouteGenerator:
+    buffer_size: int
+    source: Callable[[int], bytes]
+    def __init__(self, buffer_size: int = ..., source: Callable[[int], bytes] = ...) -> None: ...
+    def __call__(self) -> str: ...
+    def routes(self, size: int) -> list[str]: ...
 
 class DomainRouter:
     domain_key: Incomplete
     max_route_size: int
     shard_count: Incomplete
-    def __init__(self, domain: str, shard_count: int) -> None: ...
+    route_generator: Optional[RouteGenerator]
+    strategy: str | Callable[[int], tuple[int, ...]]
+    shard_table: tuple[int, ...]
+    def __init__(
+        self,
+        domain: str,
+        shard_count: int,
+        route_generator: Optional[RouteGenerator] = ...,
+        strategy: str | Callable[[int], tuple[int, ...]] = ...,
+    ) -> None: ...
     def domain(self) -> str: ...
     def route(self) -> str: ...
+    def routes(self, size: int) -> list[str]: ...
 
 class KeyGen:
     domain_router: Incomplete
     base62: Incomplete
     counter: Incomplete
+    metrics: Optional[KeyMetrics]
+    monotonic: bool
+    state: Optional[CounterState]
     def __init__(
         self,
         domain_router: DomainRouter,
         base62: Optional[Base62] = ...,
         counter: Optional[Counter] = ...,
+        monotonic: bool = ...,
+        state: Optional[CounterState] = ...,
     ) -> None: ...
     @classmethod
-    def create(cls, domain: str, shard_count: Optional[int] = ...) -> Self: ...
+    def create(
+        cls,
+        domain: str,
+        shard_count: Optional[int] = ...,
+        worker_id: Optional[int] = ...,
+        worker_count: Optional[int] = ...,
+        *,
+        strategy: str = ...,
+        monotonic: bool = ...,
+        state: Optional[str | Path] = ...,
+    ) -> Self: ...
+    def resume(self, timestamp: int, count: int, interval: int) -> None: ...
+    def enable_metrics(self) -> KeyMetrics: ...
+    def disable_metrics(self) -> None: ...
+    def snapshot(self) -> dict: ...
+    def encode_timestamp(self, milliseconds: int) -> str: ...
+    def next_stamp(self, milliseconds: int) -> tuple[int, int]: ...
     def txkey(self, milliseconds: Optional[int] = ...): ...
     def route_key(self, milliseconds: Optional[int] = ...): ...
+    def compile(self) -> Callable[[], str]: ...
+    def txkeys(self, size: int, out: Optional[list[str]] = ...) -> list[str]: ...
+    def route_keys(self, size: int, out: Optional[list[str]] = ...) -> list[str]: ...
+    def parse_timestamp(self, key: str) -> int: ...
+    def parse_datetime(self, key: str) -> datetime: ...
+    def parse_timestamps(self, keys: Iterable[str], as_datetime: bool = ...) -> Iterator[int | datetime]: ...
+    def key_range(self, start: datetime, end: datetime) -> tuple[str, str]: ...
+    def route_key_ranges(self, start: datetime, end: datetime) -> list[tuple[str, str]]: ...
+    def timestamp_window(self) -> tuple[Any, Any, Optional[Callable[[str], int]]]: ...
+    def is_valid_route_key(self, key: str, strict: bool = ...) -> bool: ...
+    def is_valid_many(self, keys: Iterable[Any], strict: bool = ...) -> Iterator[bool]: ...
+    def filter_valid(self, keys: Iterable[Any], strict: bool = ...) -> Iterator[str]: ...
     def parse_route(self, key: str) -> int: ...
+    def parse_routes(self, keys: Any, width: int = ...) -> Any: ...
+    def bucket_routes(self, keys: Iterable[str], chunk_size: int = ...) -> Iterator[dict[int, list[str]]]: ...
+
+def pack_txkey(key: str, base62: Optional[Base62] = ...) -> int: ...
+def unpack_txkey(number: int, base62: Optional[Base62] = ...) -> str: ...
+def pack_route_key(key: str, base62: Optional[Base62] = ...) -> bytes: ...
+def unpack_route_key(data: bytes | bytearray | memoryview, base62: Optional[Base62] = ...) -> str: ...
+def pack_route_keys(keys: Iterable[str], base62: Optional[Base62] = ...) -> bytearray: ...
+def unpack_route_keys(buffer: bytes | bytearray | memoryview, base62: Optional[Base62] = ...) -> Iterator[str]: ...
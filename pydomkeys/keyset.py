@@ -0,0 +1,221 @@
+"""A library for domain entity key generation identifiers.
+
+This module has a compact set for txkeys and route keys.  Rather than holding every key as a
+python string (roughly 65 bytes each plus the set's own table) the KeySet packs the txkey part
+of each key into its 72 bit int (see pydomkeys.keys.pack_txkey) and stores it in array backed
+open addressing hash tables, one per domain and route prefix.  Plain txkeys are spread over up
+to 62 tables by their last character, the low digit of the counter, so no single table has to
+hold (and regrow) every txkey.
+
+Each slot costs 12 bytes and tables grow by doubling at 75% load, so memory stays between 16
+and 32 bytes per key regardless of how many keys are added.
+
+Examples:
+--------
+    >>> from pydomkeys.keys import KeyGen
+    >>> from pydomkeys.keyset import KeySet
+    >>> keygen = KeyGen.create("US", 4)
+    >>> keys = keygen.route_keys(1_000)
+    >>> kset = KeySet(keys)
+    >>> len(kset)
+    1000
+    >>> keys[0] in kset
+    True
+    >>> kset.add(keys[0])
+    False
+
+The module contains the following classes:
+- `KeySet` - add, contains and merge for millions of keys with predictable memory per key
+"""
+
+from array import array
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+from pydomkeys.base62 import Base62
+from pydomkeys.keys import ROUTE_KEY_LENGTH, TXKEY_LENGTH
+
+MASK64 = 0xFFFF_FFFF_FFFF_FFFF
+MASK32 = 0xFFFF_FFFF
+GOLDEN64 = 0x9E37_79B9_7F4A_7C15
+GOLDEN32 = 0x9E37_79B1
+ROUTE_PREFIX_LENGTH = 4
+
+
+class _Bucket:
+    """Open addressing hash table of 72 bit ints split over a high 'Q' and a low 'I' array."""
+
+    def __init__(self, bits: int = 6):
+        """Initialize an empty table of 2 ** bits slots; a zero high word marks an empty slot."""
+        self.bits = bits
+        self.size = 0
+        self.high = array("Q", bytes(8 << bits))
+        self.low = array("I", bytes(4 << bits))
+
+    def _find(self, high: int, low: int) -> tuple[int, bool]:
+        """Return the slot holding the value or the empty slot where it belongs, and whether it was found."""
+        table_high, table_low = self.high, self.low
+        mask = (1 << self.bits) - 1
+        slot = ((((high ^ (low * GOLDEN32)) * GOLDEN64) & MASK64) >> (64 - self.bits)) & mask
+
+        while True:
+            current = table_high[slot]
+            if current == 0:
+                return slot, False
+
+            if current == high and table_low[slot] == low:
+                return slot, True
+
+            slot = (slot + 1) & mask
+
+    def add(self, value: int) -> bool:
+        """Add the value and return True if it was not already in the table."""
+        high, low = (value >> 32) + 1, value & MASK32
+        slot, found = self._find(high, low)
+        if found:
+            return False
+
+        self.high[slot] = high
+        self.low[slot] = low
+        self.size += 1
+
+        if self.size * 4 > 3 << self.bits:
+            self._grow()
+
+        return True
+
+    def __contains__(self, value: int) -> bool:
+        """Return True if the value is in the table."""
+        return self._find((value >> 32) + 1, value & MASK32)[1]
+
+    def __iter__(self) -> Iterator[int]:
+        """Yield the values in table order."""
+        for high, low in zip(self.high, self.low, strict=True):
+            if high:
+                yield ((high - 1) << 32) | low
+
+    def _grow(self) -> None:
+        """Double the table and re-insert every value straight from the old arrays."""
+        old_high, old_low = self.high, self.low
+
+        self.bits += 1
+        self.high = array("Q", bytes(8 << self.bits))
+        self.low = array("I", bytes(4 << self.bits))
+
+        for slot in range(len(old_high)):
+            high = old_high[slot]
+            if high:
+                low = old_low[slot]
+                index, _ = self._find(high, low)
+                self.high[index] = high
+                self.low[index] = low
+
+    @property
+    def nbytes(self) -> int:
+        """Return the bytes used by the table arrays."""
+        return self.high.itemsize * len(self.high) + self.low.itemsize * len(self.low)
+
+
+class KeySet:
+    """KeySet holds txkeys and route keys as packed ints in array backed tables partitioned by route."""
+
+    def __init__(self, keys: Optional[Iterable[str]] = None, base62: Optional[Base62] = None):
+        """Initialize the set with optional keys and the Base62 alphabet used to pack them."""
+        self.base62 = Base62() if base62 is None else base62
+        self.partitions: dict[str, _Bucket] = {}
+        self._size = 0
+
+        if keys is not None:
+            self.update(keys)
+
+    def __repr__(self):
+        """Show the number of keys, partitions and bytes used."""
+        return f"keys: {self._size}, partitions: {len(self.partitions)}, bytes: {self.nbytes}"
+
+    def __len__(self) -> int:
+        """Return the number of keys in the set."""
+        return self._size
+
+    def _split(self, key: str) -> tuple[str, int]:
+        """Return the partition and the packed txkey value of the key.
+
+        Route keys are partitioned by their four character domain and route prefix, txkeys by
+        their last character; the prefix length tells the two kinds of partition apart.
+        """
+        if len(key) == ROUTE_KEY_LENGTH:
+            return key[:ROUTE_PREFIX_LENGTH], self.base62.decode(key[ROUTE_PREFIX_LENGTH:])
+
+        if len(key) == TXKEY_LENGTH:
+            return key[-1], self.base62.decode(key)
+
+        msg = f"key {key!r} is neither a {TXKEY_LENGTH} character txkey nor a {ROUTE_KEY_LENGTH} character route key"
+        raise ValueError(msg)
+
+    def add(self, key: str) -> bool:
+        """Add the key and return True if it was not already in the set."""
+        prefix, value = self._split(key)
+
+        bucket = self.partitions.get(prefix)
+        if bucket is None:
+            bucket = self.partitions[prefix] = _Bucket()
+
+        if bucket.add(value):
+            self._size += 1
+            return True
+
+        return False
+
+    def update(self, keys: Iterable[str]) -> int:
+        """Add every key and return the number that were not already in the set."""
+        added = 0
+        for key in keys:
+            added += self.add(key)
+
+        return added
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if the key is in the set."""
+        if not isinstance(key, str):
+            return False
+
+        try:
+            prefix, value = self._split(key)
+        except ValueError:
+            return False
+
+        bucket = self.partitions.get(prefix)
+        return bucket is not None and value in bucket
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield every key in the set, partition by partition."""
+        encode_fixed = self.base62.encode_fixed
+        for partition, bucket in self.partitions.items():
+            prefix = partition if len(partition) == ROUTE_PREFIX_LENGTH else ""
+            for value in bucket:
+                yield prefix + encode_fixed(value, TXKEY_LENGTH)
+
+    def merge(self, other: "KeySet") -> int:
+        """Add every key of the other set and return the number that were new.
+
+        Packed values are copied directly when both sets share an alphabet; otherwise the
+        other set's keys are decoded and re-added.
+        """
+        if other.base62.alphabet != self.base62.alphabet:
+            return self.update(other)
+
+        added = 0
+        for prefix, other_bucket in other.partitions.items():
+            bucket = self.partitions.get(prefix)
+            if bucket is None:
+                bucket = self.partitions[prefix] = _Bucket()
+
+            for value in other_bucket:
+                added += bucket.add(value)
+
+        self._size += added
+        return added
+
+    @property
+    def nbytes(self) -> int:
+        """Return the bytes used by the partition arrays."""
+        return sum(bucket.nbytes for bucket in self.partitions.values())
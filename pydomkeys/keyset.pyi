@@ -0,0 +1,23 @@
+from collections.abc import Iterable, Iterator
+from typing import Optional
+
+from .base62 import Base62 as Base62
+
+MASK64: int
+MASK32: int
+GOLDEN64: int
+GOLDEN32: int
+ROUTE_PREFIX_LENGTH: int
+
+class KeySet:
+    base62: Base62
+    partitions: dict[str, object]
+    def __init__(self, keys: Optional[Iterable[str]] = ..., base62: Optional[Base62] = ...) -> None: ...
+    def __len__(self) -> int: ...
+    def add(self, key: str) -> bool: ...
+    def update(self, keys: Iterable[str]) -> int: ...
+    def __contains__(self, key: object) -> bool: ...
+    def __iter__(self) -> Iterator[str]: ...
+    def merge(self, other: KeySet) -> int: ...
+    @property
+    def nbytes(self) -> int: ...
@@ -0,0 +1,383 @@
+"""A library for domain entity key generation identifiers.
+
+This module shares one counter range between many processes, or hosts, through a small
+asyncio lease server on a unix or tcp socket.  The server splits x_min..x_max into blocks
+and leases each block to one client at a time; a `LeasedCounter` hands out counts from its
+block locally and fetches the next block in the background when the current one is running
+low, so there is one round trip per block of thousands of keys rather than one per key.
+
+Clients never hold the same block at once, so two processes can not produce the same counter
+suffix in the same microsecond.  Leases last until the client releases them or disconnects,
+and a released block goes to the back of the free queue so it is re-leased as late as possible.
+
+Each client holds one block and, near its end, prefetches a second.  The default range and
+block size give 229 blocks, enough for about a hundred clients to prefetch; past that, clients
+wait for released blocks rather than fail.
+
+The line protocol is plain text:
+
+- `LEASE` - reply `OK <start> <end>` with the inclusive counts of a free block; a connection
+  that holds no block waits for one to be released, one that already holds a block gets
+  `ERR no free blocks` so it can release its block before asking again
+- `RELEASE <start>` - return a block held by this connection, reply `OK`
+- anything else replies `ERR <reason>`
+
+Examples:
+--------
+    >>> from pydomkeys.keys import DomainRouter, KeyGen
+    >>> from pydomkeys.lease import LeaseServer, LeasedCounter
+    >>> server = LeaseServer(block_size=1_000)
+    >>> address = server.start(("127.0.0.1", 0))
+    >>> with LeasedCounter(address) as counter:
+    ...     keygen = KeyGen(DomainRouter("US", 4), counter=counter)
+    ...     keys = keygen.route_keys(2_500)
+    ...     counter.leases
+    3
+    >>> len(set(keys))
+    2500
+    >>> server.stop()
+
+Run a standalone server with:
+
+    $ python -m pydomkeys lease --unix /tmp/pydomkeys.sock
+
+The module contains the following classes:
+- `LeaseServer` - asyncio server that leases blocks of the counter range
+- `LeasedCounter` - Counter that draws its counts from leased blocks
+"""
+
+import asyncio
+import socket
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Self
+
+from pydomkeys.keys import Counter
+
+Address = str | tuple[str, int]
+
+OK = "OK"
+ERR = "ERR"
+
+
+class LeaseServer:
+    """LeaseServer leases blocks of the x_min..x_max counter range to one client at a time."""
+
+    def __init__(self, x_min: int = 3_850, x_max: int = 238_000, block_size: int = 1_024):
+        """Initialize the range and split it into blocks of block_size counts."""
+        if block_size < 1 or x_max - x_min + 1 < block_size:
+            msg = f"can not split the range {x_min}..{x_max} into blocks of {block_size}"
+            raise ValueError(msg)
+
+        self.min, self.max = x_min, x_max
+        self.block_size = block_size
+        self.free: deque[int] = deque(range(x_min, x_max + 1, block_size))
+        self.held: set[int] = set()
+        self.granted = 0
+
+        self._released = asyncio.Condition()
+        self._handlers: dict[asyncio.StreamWriter, asyncio.Future] = {}
+        self._closing = False
+        self._server: Optional[asyncio.Server] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def __repr__(self):
+        """Show the range, block size and number of free and held blocks."""
+        free, held = len(self.free), len(self.held)
+        return f"min: {self.min}, max: {self.max}, block: {self.block_size}, free: {free}, held: {held}"
+
+    def lease(self) -> Optional[tuple[int, int]]:
+        """Take the next free block and return its inclusive (start, end), or None when every block is held."""
+        if not self.free:
+            return None
+
+        start = self.free.popleft()
+        self.held.add(start)
+        self.granted += 1
+
+        return start, min(start + self.block_size - 1, self.max)
+
+    def release(self, start: int) -> bool:
+        """Return a held block to the back of the free queue; False if the block was not held."""
+        if start not in self.held:
+            return False
+
+        self.held.remove(start)
+        self.free.append(start)
+        return True
+
+    async def _wait_lease(self) -> Optional[tuple[int, int]]:
+        """Wait until a block is free, then lease it; waiters are served in arrival order.
+
+        Return None when the server is closing instead.
+        """
+        async with self._released:
+            await self._released.wait_for(lambda: self.free or self._closing)
+            return self.lease()
+
+    async def _release(self, start: int) -> None:
+        """Release the block and wake the next client waiting for one."""
+        async with self._released:
+            if self.release(start):
+                self._released.notify()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Answer one client's requests and release its blocks when it disconnects."""
+        owned: set[int] = set()
+        task = asyncio.current_task()
+        if task is not None:
+            self._handlers[writer] = task
+
+        try:
+            while line := await reader.readline():
+                command, *args = line.decode().split() or [""]
+                if command == "LEASE" and not args:
+                    block = self.lease()
+                    if block is None and not owned:
+                        block = await self._wait_lease()
+
+                    if block is None:
+                        reply = f"{ERR} no free blocks"
+                    else:
+                        owned.add(block[0])
+                        reply = f"{OK} {block[0]} {block[1]}"
+                elif command == "RELEASE" and len(args) == 1 and args[0].isdigit() and int(args[0]) in owned:
+                    owned.remove(int(args[0]))
+                    await self._release(int(args[0]))
+                    reply = OK
+                else:
+                    reply = f"{ERR} bad request {line.decode().strip()!r}"
+
+                writer.write(f"{reply}\n".encode())
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            for start in owned:
+                await self._release(start)
+            writer.close()
+            self._handlers.pop(writer, None)
+
+    async def serve(self, address: Address) -> asyncio.Server:
+        """Start listening on a unix socket path or a (host, port) tcp address and return the server."""
+        self._released = asyncio.Condition()
+        self._closing = False
+        if isinstance(address, str):
+            self._server = await asyncio.start_unix_server(self.handle, path=address)
+        else:
+            self._server = await asyncio.start_server(self.handle, *address)
+
+        return self._server
+
+    def start(self, address: Address) -> Address:
+        """Serve from a daemon thread with its own event loop and return the bound address.
+
+        A tcp port of 0 binds a free port; the returned address has the actual port.
+        """
+        ready = threading.Event()
+        self._loop = asyncio.new_event_loop()
+
+        def run() -> None:
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self.serve(address))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=run, name="pydomkeys-lease-server", daemon=True)
+        self._thread.start()
+        ready.wait()
+
+        if isinstance(address, str):
+            return address
+
+        return self._server.sockets[0].getsockname()[:2]
+
+    def stop(self) -> None:
+        """Close the server, disconnect its clients and stop the thread started by start()."""
+        if self._loop is None or self._server is None:
+            return
+
+        async def close() -> None:
+            # stop accepting, wake the clients waiting for a block and hang up on the rest, then
+            # let every handler finish before the loop goes away
+            self._server.close()
+            self._closing = True
+            async with self._released:
+                self._released.notify_all()
+
+            for writer in list(self._handlers):
+                writer.close()
+            await asyncio.gather(*self._handlers.values(), return_exceptions=True)
+            await self._server.wait_closed()
+
+        asyncio.run_coroutine_threadsafe(close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+        self._loop = self._thread = self._server = None
+
+    def run(self, address: Address) -> None:
+        """Serve on the address until interrupted."""
+
+        async def forever() -> None:
+            server = await self.serve(address)
+            async with server:
+                await server.serve_forever()
+
+        asyncio.run(forever())
+
+
+class LeasedCounter(Counter):
+    """Counter whose counts come from blocks leased from a LeaseServer.
+
+    The next block is requested in the background once renew_at counts (default a quarter of
+    the block) are left, and the finished block is released as soon as the counter moves on.
+    When no block was free for the prefetch the counter releases its block first and then
+    waits, up to timeout seconds, for the server to lease it another.
+    Counts within one microsecond never repeat as long as a KeyGen batch stays within span().
+    Do not use with monotonic mode, which takes its counts from the bottom of the range.
+    """
+
+    __slots__ = ("_address", "_file", "_lock", "_next", "_renew", "_request_lock", "_sock", "leases", "renew_at")
+
+    def __init__(self, address: Address, renew_at: Optional[int] = None, timeout: float = 10.0):
+        """Connect to the lease server at the unix path or (host, port) and wait for the first block."""
+        if isinstance(address, str):
+            self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._sock.settimeout(timeout)
+            self._sock.connect(address)
+        else:
+            self._sock = socket.create_connection(address, timeout=timeout)
+
+        self._address = address
+        self._file = self._sock.makefile("rwb")
+        self._lock = threading.Lock()
+        self._request_lock = threading.Lock()
+        self._renew = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pydomkeys-lease")
+        self._next: Optional[Future] = None
+        self.leases = 0
+
+        try:
+            start, end = self._lease()
+        except (OSError, RuntimeError):
+            self._renew.shutdown()
+            self._file.close()
+            self._sock.close()
+            raise
+
+        super().__init__(start, end, start - 1)
+        self.renew_at = (end - start + 1) // 4 if renew_at is None else renew_at
+
+    def __repr__(self):
+        """Show the current block, count and number of leases."""
+        return f"count: {self.count}, block: {self.min}..{self.max}, leases: {self.leases}"
+
+    def __enter__(self) -> Self:
+        """Return the counter for use as a context manager."""
+        return self
+
+    def __exit__(self, *_args) -> None:
+        """Release the current block and close the connection."""
+        self.close()
+
+    def _request(self, line: str) -> list[str]:
+        """Send one request line and return the words of an OK reply; raise RuntimeError on ERR."""
+        with self._request_lock:
+            self._file.write(f"{line}\n".encode())
+            self._file.flush()
+            reply = self._file.readline().decode().split()
+
+        if not reply:
+            msg = f"lease server {self._address} closed the connection"
+            raise ConnectionError(msg)
+
+        if reply[0] != OK:
+            msg = f"lease server {self._address}: {' '.join(reply[1:])}"
+            raise RuntimeError(msg)
+
+        return reply[1:]
+
+    def _lease(self) -> tuple[int, int]:
+        """Request a block and return its inclusive (start, end)."""
+        start, end = self._request("LEASE")
+        self.leases += 1
+        return int(start), int(end)
+
+    def _next_block(self) -> Optional[tuple[int, int]]:
+        """Return the prefetched block, or None when there was none or no block was free for it."""
+        prefetch, self._next = self._next, None
+        if prefetch is None:
+            return None
+
+        try:
+            return prefetch.result()
+        except RuntimeError:
+            return None
+
+    def _advance(self) -> None:
+        """Release the finished block and move to the prefetched one, or wait for a new one."""
+        block = self._next_block()
+
+        self._request(f"RELEASE {self.min}")
+        if block is None:
+            block = self._lease()
+
+        self.min, self.max = block
+        self.count = self.min - 1
+
+    def _prefetch(self) -> None:
+        """Request the next block in the background once the current one is running low."""
+        if self._next is None and self.max - self.count <= self.renew_at:
+            self._next = self._renew.submit(self._lease)
+
+    def next_count(self) -> int:
+        """Return the next count of the current block, moving to the next block when it is used up."""
+        with self._lock:
+            if self.count >= self.max:
+                self._advance()
+
+            self.count += 1
+            self._prefetch()
+            return self.count
+
+    def next_counts(self, size: int) -> list[int]:
+        """Return the next size counts, spanning as many blocks as needed."""
+        counts: list[int] = []
+        with self._lock:
+            while len(counts) < size:
+                if self.count >= self.max:
+                    self._advance()
+
+                stop = min(self.max, self.count + size - len(counts))
+                counts.extend(range(self.count + 1, stop + 1))
+                self.count = stop
+                self._prefetch()
+
+        return counts
+
+    def reset(self) -> int:
+        """Restart the current block and return its first count."""
+        with self._lock:
+            self.count = self.min - 1
+            return self.min
+
+    def span(self) -> int:
+        """Return the size of the current block; a batch this size touches at most two held blocks."""
+        return self.max - self.min + 1
+
+    def close(self) -> None:
+        """Release the held blocks and close the connection."""
+        if self._file.closed:
+            return
+
+        with self._lock:
+            block = self._next_block()
+            if block is not None:
+                self._request(f"RELEASE {block[0]}")
+
+            self._request(f"RELEASE {self.min}")
+            self._renew.shutdown()
+            self._file.close()
+            self._sock.close()
@@ -0,0 +1,34 @@
+import asyncio
+from collections import deque
+from typing import Optional, Self
+
+from .keys import Counter as Counter
+
+Address = str | tuple[str, int]
+
+OK: str
+ERR: str
+
+class LeaseServer:
+    min: int
+    max: int
+    block_size: int
+    free: deque[int]
+    held: set[int]
+    granted: int
+    def __init__(self, x_min: int = ..., x_max: int = ..., block_size: int = ...) -> None: ...
+    def lease(self) -> Optional[tuple[int, int]]: ...
+    def release(self, start: int) -> bool: ...
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None: ...
+    async def serve(self, address: Address) -> asyncio.Server: ...
+    def start(self, address: Address) -> Address: ...
+    def stop(self) -> None: ...
+    def run(self, address: Address) -> None: ...
+
+class LeasedCounter(Counter):
+    leases: int
+    renew_at: int
+    def __init__(self, address: Address, renew_at: Optional[int] = ..., timeout: float = ...) -> None: ...
+    def __enter__(self) -> Self: ...
+    def __exit__(self, *_args) -> None: ...
+    def close(self) -> None: ...
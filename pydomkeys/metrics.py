@@ -0,0 +1,98 @@
+"""A library for domain entity key generation identifiers.
+
+This module has the opt-in metrics for a KeyGen.  Metrics are off by default and cost a single
+`is None` check per key; when enabled they are plain int counters on the generator that are
+read with `snapshot()`, which returns a plain dict for Prometheus or StatsD shims.
+
+Counter rollovers are always counted by the Counter itself since the roll-over branch is rare.
+
+Examples:
+--------
+    >>> from pydomkeys.keys import KeyGen
+    >>> keygen = KeyGen.create("US", 4)
+    >>> metrics = keygen.enable_metrics()
+    >>> keys = [keygen.route_key() for _ in range(10)]
+    >>> snapshot = keygen.snapshot()
+    >>> snapshot["route_keys"], sum(snapshot["shards"].values())
+    (10, 10)
+
+The module contains the following classes:
+- `KeyMetrics` - keys generated, same-microsecond bursts, clock regressions and the route histogram
+"""
+
+from collections.abc import Iterable
+
+from pydomkeys.shards import HEX_ROUTES, ROUTE_COUNT, route_lookup
+
+ROUTE_INDEX = route_lookup(tuple(range(ROUTE_COUNT)))
+
+
+class KeyMetrics:
+    """KeyMetrics counts the keys a KeyGen generates and how its clock behaves."""
+
+    def __init__(self):
+        """Initialize all counters to zero."""
+        self.keys = 0
+        self.route_keys = 0
+        self.bursts = 0
+        self.clock_regressions = 0
+        self.last_timestamp = -1
+        self.routes = [0] * ROUTE_COUNT
+
+    def __repr__(self):
+        """Show the key, burst and regression counts."""
+        return f"keys: {self.keys}, bursts: {self.bursts}, clock regressions: {self.clock_regressions}"
+
+    def record(self, milliseconds: int, size: int = 1) -> None:
+        """Record size keys stamped with the microsecond timestamp.
+
+        Every key sharing a timestamp with the key before it counts as a burst; a timestamp earlier
+        than the previous one counts as a clock regression.
+        """
+        last = self.last_timestamp
+        if milliseconds == last:
+            self.bursts += size
+        else:
+            self.bursts += size - 1
+            if milliseconds < last:
+                self.clock_regressions += 1
+
+        self.last_timestamp = milliseconds
+        self.keys += size
+
+    def record_route(self, route: str) -> None:
+        """Record one route key with the two character hex route."""
+        self.route_keys += 1
+        self.routes[ROUTE_INDEX[route]] += 1
+
+    def record_routes(self, routes: Iterable[str]) -> None:
+        """Record a batch of route keys with the two character hex routes."""
+        counts = self.routes
+        size = 0
+        for route in routes:
+            counts[ROUTE_INDEX[route]] += 1
+            size += 1
+
+        self.route_keys += size
+
+    def reset(self) -> None:
+        """Reset all counters to zero."""
+        self.__init__()
+
+    def snapshot(self, shard_table: tuple[int, ...], rollovers: int = 0) -> dict:
+        """Return the counters as a plain dict, with the route histogram folded into shards by shard_table."""
+        shards: dict[int, int] = {}
+        for route, count in enumerate(self.routes):
+            shard = shard_table[route]
+            shards[shard] = shards.get(shard, 0) + count
+
+        return {
+            "keys": self.keys,
+            "txkeys": self.keys - self.route_keys,
+            "route_keys": self.route_keys,
+            "bursts": self.bursts,
+            "clock_regressions": self.clock_regressions,
+            "counter_rollovers": rollovers,
+            "routes": {HEX_ROUTES[route]: count for route, count in enumerate(self.routes) if count},
+            "shards": dict(sorted(shards.items())),
+        }
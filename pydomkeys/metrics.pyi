@@ -0,0 +1,17 @@
+from collections.abc import Iterable
+
+ROUTE_INDEX: dict[str, int]
+
+class KeyMetrics:
+    keys: int
+    route_keys: int
+    bursts: int
+    clock_regressions: int
+    last_timestamp: int
+    routes: list[int]
+    def __init__(self) -> None: ...
+    def record(self, milliseconds: int, size: int = ...) -> None: ...
+    def record_route(self, route: str) -> None: ...
+    def record_routes(self, routes: Iterable[str]) -> None: ...
+    def reset(self) -> None: ...
+    def snapshot(self, shard_table: tuple[int, ...], rollovers: int = ...) -> dict: ...
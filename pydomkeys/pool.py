@@ -0,0 +1,223 @@
+"""A library for domain entity key generation identifiers.
+
+This module wraps a KeyGen with a pool of pre-generated route keys so the request path
+only pops a key from a ring buffer.  The pool is refilled in batches by a background
+thread (or inline when background is off) whenever it falls below the low-water mark.
+
+Keys in the pool were generated ahead of time, so their timestamps are the time the batch
+was generated rather than the time the key was handed out.
+
+Examples:
+--------
+    >>> from pydomkeys.keys import KeyGen
+    >>> from pydomkeys.pool import KeyPool
+    >>> pool = KeyPool(KeyGen.create("US", 4), capacity=1_000, background=False)
+    >>> key = pool.get()
+    >>> assert len(key) == 16
+    >>> pool.stats()["hits"]
+    1
+    >>> pool.close()
+
+The module contains the following classes:
+- `KeyPool` - pre-generated route keys with blocking `get()` and async `aget()`
+"""
+
+import asyncio
+import threading
+from collections import deque
+from typing import Optional, Self
+
+from pydomkeys.keys import KeyGen
+
+
+class KeyPool:
+    """KeyPool keeps a ring buffer of pre-generated route keys for a KeyGen."""
+
+    def __init__(
+        self,
+        keygen: KeyGen,
+        capacity: int = 10_000,
+        low_water: Optional[int] = None,
+        batch_size: Optional[int] = None,
+        background: bool = True,
+    ):
+        """Initialize the pool and fill it to capacity.
+
+        The pool is refilled when it drops below low_water (default one quarter of capacity)
+        in batches of batch_size keys (default the difference between the two).  With
+        background set a daemon thread does the refills, and low_water must be at least 1 so
+        it is ever woken; otherwise get() refills inline.
+        """
+        self.keygen = keygen
+        self.capacity = capacity
+        self.low_water = capacity // 4 if low_water is None else low_water
+        self.batch_size = capacity - self.low_water if batch_size is None else batch_size
+
+        lowest = 1 if background else 0
+        if not lowest <= self.low_water < capacity or self.batch_size < 1:
+            msg = f"invalid pool settings: capacity {capacity}, low water {self.low_water}, batch {self.batch_size}"
+            raise ValueError(msg)
+
+        self.hits = 0
+        self.stalls = 0
+        self.refills = 0
+        self.generated = 0
+
+        self._keys: deque[str] = deque()
+        self._keygen_lock = threading.Lock()
+        self._refill_lock = threading.Lock()
+        self._refilling = False
+        self._cond = threading.Condition()
+        self._closed = False
+
+        self.refill()
+
+        self._thread = None
+        if background:
+            self._thread = threading.Thread(target=self._run, name="pydomkeys-keypool", daemon=True)
+            self._thread.start()
+
+    def __repr__(self):
+        """Show the pool size, capacity and low-water mark."""
+        return f"size: {len(self._keys)}, capacity: {self.capacity}, low water: {self.low_water}"
+
+    def __len__(self) -> int:
+        """Return the number of keys currently in the pool."""
+        return len(self._keys)
+
+    def __enter__(self) -> Self:
+        """Return the pool for use as a context manager."""
+        return self
+
+    def __exit__(self, *_args) -> None:
+        """Close the pool and stop the background thread."""
+        self.close()
+
+    def refill(self) -> int:
+        """Top the pool up to capacity in batches and return the number of keys added.
+
+        Refills run one at a time, so a refill that starts while another is running only adds
+        whatever the first one left short.
+        """
+        added = 0
+        with self._refill_lock:
+            while (need := self.capacity - len(self._keys)) > 0:
+                with self._keygen_lock:
+                    keys = self.keygen.route_keys(min(need, self.batch_size))
+
+                self._keys.extend(keys)
+                added += len(keys)
+
+            if added:
+                self.refills += 1
+                self.generated += added
+
+        return added
+
+    def _refill_later(self) -> None:
+        """Refill on a worker thread for aget, unless a refill started by aget is still running."""
+        if self._refilling:
+            return
+
+        def run() -> None:
+            try:
+                self.refill()
+            finally:
+                self._refilling = False
+
+        self._refilling = True
+        asyncio.get_running_loop().run_in_executor(None, run)
+
+    def _run(self) -> None:
+        """Refill the pool whenever get() signals that it dropped below the low-water mark."""
+        cond = self._cond
+        while True:
+            with cond:
+                while not self._closed and len(self._keys) >= self.low_water:
+                    cond.wait()
+
+                if self._closed:
+                    return
+
+            self.refill()
+
+    def _stall(self) -> str:
+        """Return a key when the pool has run dry, generating it directly or refilling inline."""
+        self.stalls += 1
+
+        if self._thread is None:
+            self.refill()
+            return self._keys.popleft()
+
+        with self._cond:
+            self._cond.notify()
+
+        with self._keygen_lock:
+            self.generated += 1
+            return self.keygen.route_key()
+
+    def get(self) -> str:
+        """Return the next route key from the pool.
+
+        Stats are plain counters and may under-count slightly when several threads call get at once.
+        """
+        try:
+            key = self._keys.popleft()
+        except IndexError:
+            return self._stall()
+
+        self.hits += 1
+
+        if len(self._keys) < self.low_water:
+            if self._thread is None:
+                self.refill()
+            else:
+                with self._cond:
+                    self._cond.notify()
+
+        return key
+
+    async def aget(self) -> str:
+        """Return the next route key without blocking the event loop.
+
+        Keys are popped straight from the pool.  Crossing the low-water mark without the background
+        thread starts a single refill on a worker thread, which is not awaited, so the caller gets
+        its key at once; only a dry pool makes the caller wait, in a worker thread.
+        """
+        try:
+            key = self._keys.popleft()
+        except IndexError:
+            return await asyncio.to_thread(self.get)
+
+        self.hits += 1
+
+        if len(self._keys) < self.low_water:
+            if self._thread is None:
+                self._refill_later()
+            else:
+                with self._cond:
+                    self._cond.notify()
+
+        return key
+
+    def stats(self) -> dict[str, float]:
+        """Return the pool size, hits, stalls, refills, generated keys and hit rate as a dict."""
+        gets = self.hits + self.stalls
+        return {
+            "size": len(self._keys),
+            "hits": self.hits,
+            "stalls": self.stalls,
+            "refills": self.refills,
+            "generated": self.generated,
+            "hit_rate": self.hits / gets if gets else 1.0,
+        }
+
+    def close(self) -> None:
+        """Stop the background refill thread; keys remaining in the pool can still be read."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,29 @@
+from typing import Optional, Self
+
+from .keys import KeyGen as KeyGen
+
+class KeyPool:
+    keygen: KeyGen
+    capacity: int
+    low_water: int
+    batch_size: int
+    hits: int
+    stalls: int
+    refills: int
+    generated: int
+    def __init__(
+        self,
+        keygen: KeyGen,
+        capacity: int = ...,
+        low_water: Optional[int] = ...,
+        batch_size: Optional[int] = ...,
+        background: bool = ...,
+    ) -> None: ...
+    def __len__(self) -> int: ...
+    def __enter__(self) -> Self: ...
+    def __exit__(self, *_args) -> None: ...
+    def refill(self) -> int: ...
+    def get(self) -> str: ...
+    async def aget(self) -> str: ...
+    def stats(self) -> dict[str, float]: ...
+    def close(self) -> None: ...
@@ -0,0 +1,161 @@
+"""A library for domain entity key generation identifiers.
+
+This module holds the key generators for many domains in one registry.  Every generator
+shares the registry's Base62 alphabet and buffered RouteGenerator, and incoming keys are
+dispatched to their generator by the two character domain prefix with a single dict lookup,
+so parsing a key never has to guess which generator owns it.
+
+Examples:
+--------
+    >>> from pydomkeys.registry import KeyGenRegistry
+    >>> registry = KeyGenRegistry(["US", "CU", "OR"], shard_count=4)
+    >>> key = registry.route_key("CU")
+    >>> registry.keygen_for(key).domain_router.domain()
+    'CU'
+    >>> assert registry.parse_route(key) < 4
+    >>> registry.is_valid_route_key("XX" + key[2:])
+    False
+    >>> [key[:2] for key in registry.route_keys(["US", "OR"])]
+    ['US', 'OR']
+
+The module contains the following classes:
+- `KeyGenRegistry` - per-domain KeyGens with shared tables and O(1) dispatch of parse and validation
+"""
+
+import time
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from typing import Optional
+
+from pydomkeys.base62 import Base62
+from pydomkeys.keys import Counter, DomainRouter, KeyGen, RouteGenerator
+
+DOMAIN_LENGTH = 2
+
+
+class KeyGenRegistry:
+    """KeyGenRegistry creates and holds the KeyGen for each two character domain."""
+
+    def __init__(  # noqa: PLR0913
+        self,
+        domains: Iterable[str] = (),
+        shard_count: int = 1,
+        *,
+        strategy: str = "modulo",
+        base62: Optional[Base62] = None,
+        route_generator: Optional[RouteGenerator] = None,
+        monotonic: bool = False,
+    ):
+        """Initialize the shared Base62 and RouteGenerator and register the domains.
+
+        The shard_count, strategy and monotonic settings are the defaults for every registered
+        domain; register a domain directly to override them.
+        """
+        self.shard_count = shard_count
+        self.strategy = strategy
+        self.monotonic = monotonic
+        self.base62 = Base62() if base62 is None else base62
+        self.route_generator = RouteGenerator() if route_generator is None else route_generator
+        self.generators: dict[str, KeyGen] = {}
+
+        for domain in domains:
+            self.register(domain)
+
+    def __repr__(self):
+        """Show the registered domains."""
+        return f"domains: {', '.join(self.generators)}"
+
+    def __len__(self) -> int:
+        """Return the number of registered domains."""
+        return len(self.generators)
+
+    def __contains__(self, domain: object) -> bool:
+        """Return True if the domain is registered."""
+        return domain in self.generators
+
+    def __iter__(self) -> Iterator[str]:
+        """Yield the registered domains in registration order."""
+        return iter(self.generators)
+
+    def __getitem__(self, domain: str) -> KeyGen:
+        """Return the KeyGen for the domain; raise KeyError if it is not registered."""
+        return self.generators[domain]
+
+    def register(
+        self,
+        domain: str,
+        shard_count: Optional[int] = None,
+        *,
+        strategy: Optional[str] = None,
+        counter: Optional[Counter] = None,
+        monotonic: Optional[bool] = None,
+    ) -> KeyGen:
+        """Create, register and return the KeyGen for a two character domain.
+
+        The generator shares the registry's Base62 and RouteGenerator; shard_count, strategy and
+        monotonic default to the registry's.  Raise ValueError for a domain that is already registered.
+        """
+        if len(domain) != DOMAIN_LENGTH:
+            msg = f"domain {domain!r} must be {DOMAIN_LENGTH} characters"
+            raise ValueError(msg)
+
+        if domain in self.generators:
+            msg = f"domain {domain!r} is already registered"
+            raise ValueError(msg)
+
+        router = DomainRouter(
+            domain,
+            self.shard_count if shard_count is None else shard_count,
+            route_generator=self.route_generator,
+            strategy=self.strategy if strategy is None else strategy,
+        )
+
+        keygen = KeyGen(
+            router,
+            base62=self.base62,
+            counter=counter,
+            monotonic=self.monotonic if monotonic is None else monotonic,
+        )
+        self.generators[domain] = keygen
+
+        return keygen
+
+    def keygen_for(self, key: str) -> KeyGen:
+        """Return the KeyGen that owns the key by its domain prefix; raise ValueError for unknown domains."""
+        keygen = self.generators.get(key[:DOMAIN_LENGTH])
+        if keygen is None:
+            msg = f"key {key!r} does not start with a registered domain"
+            raise ValueError(msg)
+
+        return keygen
+
+    def route_key(self, domain: str, milliseconds: Optional[int] = None) -> str:
+        """Return a route key for the registered domain."""
+        return self.generators[domain].route_key(milliseconds)
+
+    def route_keys(self, domains: Iterable[str], milliseconds: Optional[int] = None) -> list[str]:
+        """Return one route key for each domain, all stamped from a single clock read."""
+        milliseconds = time.time_ns() // 1_000 if milliseconds is None else milliseconds
+        generators = self.generators
+
+        return [generators[domain].route_key(milliseconds) for domain in domains]
+
+    def is_valid_route_key(self, key: str, strict: bool = False) -> bool:
+        """Return True if the key is a valid route key of a registered domain; see KeyGen.is_valid_route_key."""
+        if not isinstance(key, str):
+            return False
+
+        keygen = self.generators.get(key[:DOMAIN_LENGTH])
+        return keygen is not None and keygen.is_valid_route_key(key, strict)
+
+    def parse_route(self, key: str) -> int:
+        """Return the shard number of the key using its domain's shard table."""
+        return self.keygen_for(key).parse_route(key)
+
+    def parse_timestamp(self, key: str) -> int:
+        """Return the microsecond timestamp of a route key of a registered domain."""
+        return self.keygen_for(key).parse_timestamp(key)
+
+    def parse_datetime(self, key: str) -> datetime:
+        """Return the UTC datetime of a route key of a registered domain."""
+        return self.keygen_for(key).parse_datetime(key)
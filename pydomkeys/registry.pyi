@@ -0,0 +1,48 @@
+from collections.abc import Iterable, Iterator
+from datetime import datetime
+from typing import Optional
+
+from .base62 import Base62 as Base62
+from .keys import Counter as Counter
+from .keys import KeyGen as KeyGen
+from .keys import RouteGenerator as RouteGenerator
+
+DOMAIN_LENGTH: int
+
+class KeyGenRegistry:
+    shard_count: int
+    strategy: str
+    monotonic: bool
+    base62: Base62
+    route_generator: RouteGenerator
+    generators: dict[str, KeyGen]
+    def __init__(
+        self,
+        domains: Iterable[str] = ...,
+        shard_count: int = ...,
+        *,
+        strategy: str = ...,
+        base62: Optional[Base62] = ...,
+        route_generator: Optional[RouteGenerator] = ...,
+        monotonic: bool = ...,
+    ) -> None: ...
+    def __len__(self) -> int: ...
+    def __contains__(self, domain: object) -> bool: ...
+    def __iter__(self) -> Iterator[str]: ...
+    def __getitem__(self, domain: str) -> KeyGen: ...
+    def register(
+        self,
+        domain: str,
+        shard_count: Optional[int] = ...,
+        *,
+        strategy: Optional[str] = ...,
+        counter: Optional[Counter] = ...,
+        monotonic: Optional[bool] = ...,
+    ) -> KeyGen: ...
+    def keygen_for(self, key: str) -> KeyGen: ...
+    def route_key(self, domain: str, milliseconds: Optional[int] = ...) -> str: ...
+    def route_keys(self, domains: Iterable[str], milliseconds: Optional[int] = ...) -> list[str]: ...
+    def is_valid_route_key(self, key: str, strict: bool = ...) -> bool: ...
+    def parse_route(self, key: str) -> int: ...
+    def parse_timestamp(self, key: str) -> int: ...
+    def parse_datetime(self, key: str) -> datetime: ...
@@ -0,0 +1,316 @@
+"""A library for domain entity key generation identifiers.
+
+This module maps route keys to database shards in bulk.  Every route key carries a two
+character hex route (00 through ff) at positions 2 and 3; a 256 entry shard table maps
+each route to its shard so a lookup never has to parse the hex.
+
+Keys can be passed as any iterable of strings, as a fixed-width bytes buffer (e.g. a file
+of 16 byte keys) or, when numpy is installed, as a numpy `S16` array.  numpy is optional;
+install it with the `numpy` extra.
+
+The route to shard mapping is pluggable.  With 256 routes no mapping can be perfectly even
+for shard counts that do not divide 256 (3 shards get 86, 85 and 85 routes at best), but the
+strategies differ in how many routes move when the shard count changes:
+
+- `modulo` - route % shard_count, the original mapping; balanced but moves most routes on a reshard
+- `range` - contiguous route ranges so each shard owns one hex interval; balanced
+- `jump` - jump consistent hash; minimal movement but only roughly balanced over 256 routes
+- `balanced` - grows one shard at a time by taking routes from the largest shards; balanced to
+  within one route and moves the minimum 256 * (new - old) / new routes when growing
+
+Examples:
+--------
+    >>> from pydomkeys.shards import modulo_table, parse_routes, movement
+    >>> table = modulo_table(4)
+    >>> list(parse_routes(["US00abc", "US05abc", "USffabc"], table))
+    [0, 1, 3]
+    >>> list(parse_routes(b"US00abcUS05abc", table, width=7))
+    [0, 1]
+    >>> movement(4, 6, "modulo")["routes_moved"]
+    168
+    >>> movement(4, 6, "balanced")["routes_moved"]
+    85
+
+Run the module to report route movement between shard counts for every strategy:
+
+    $ python -m pydomkeys.shards 4 6
+
+The module contains the following functions:
+- `shard_table(shard_count, strategy)` - the 256 entry route to shard table for a strategy
+- `modulo_table(shard_count)` - the route % shard_count table used by parse_route
+- `movement(old, new, strategy)` - how many routes (and keys) move between shard counts
+- `parse_routes(keys, table)` - shard numbers for a list, bytes buffer or numpy array of keys
+- `bucket_routes(keys, table)` - stream per-shard buckets of keys
+"""
+
+import sys
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from functools import cache
+from typing import Any, Optional
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None
+
+ROUTE_COUNT = 256
+HEX_ROUTES = tuple(f"{n:02x}" for n in range(ROUTE_COUNT))
+ROUTE_OFFSET = 2
+
+# hex digit byte -> nibble value (HIGH_NIBBLES shifted into the high half), NOT_HEX for anything else
+NOT_HEX = 0xFF
+NIBBLES = bytes(int(chr(b), 16) if chr(b) in "0123456789abcdefABCDEF" else NOT_HEX for b in range(256))
+HIGH_NIBBLES = bytes(NOT_HEX if nibble == NOT_HEX else nibble << 4 for nibble in NIBBLES)
+
+
+def modulo_table(shard_count: int) -> tuple[int, ...]:
+    """Return the 256 entry route to shard table for route % shard_count."""
+    if shard_count < 1:
+        msg = f"shard count must be positive, not {shard_count}"
+        raise ValueError(msg)
+
+    return tuple(route % shard_count for route in range(ROUTE_COUNT))
+
+
+def range_table(shard_count: int) -> tuple[int, ...]:
+    """Return the 256 entry route to shard table that gives each shard a contiguous range of routes."""
+    if shard_count < 1:
+        msg = f"shard count must be positive, not {shard_count}"
+        raise ValueError(msg)
+
+    return tuple(route * shard_count // ROUTE_COUNT for route in range(ROUTE_COUNT))
+
+
+def jump_hash(key: int, buckets: int) -> int:
+    """Return the bucket for key using the Lamping-Veach jump consistent hash."""
+    bucket, jump = -1, 0
+    while jump < buckets:
+        bucket = jump
+        key = (key * 2862933555777941757 + 1) & 0xFFFFFFFFFFFFFFFF
+        jump = int((bucket + 1) * ((1 << 31) / ((key >> 33) + 1)))
+
+    return bucket
+
+
+def jump_table(shard_count: int) -> tuple[int, ...]:
+    """Return the 256 entry route to shard table using jump consistent hash of the route."""
+    if shard_count < 1:
+        msg = f"shard count must be positive, not {shard_count}"
+        raise ValueError(msg)
+
+    return tuple(jump_hash(route, shard_count) for route in range(ROUTE_COUNT))
+
+
+def balanced_table(shard_count: int) -> tuple[int, ...]:
+    """Return the 256 entry route to shard table grown one shard at a time from the largest shards.
+
+    Adding shard k takes 256 // (k + 1) routes, one at a time from whichever shard currently has
+    the most, so shards stay within one route of each other and only routes that end up on
+    the new shards ever move.
+    """
+    if shard_count < 1:
+        msg = f"shard count must be positive, not {shard_count}"
+        raise ValueError(msg)
+
+    members = [list(range(ROUTE_COUNT))]
+    for new in range(1, min(shard_count, ROUTE_COUNT)):
+        taken = []
+        for _ in range(ROUTE_COUNT // (new + 1)):
+            donor = max(range(new), key=lambda shard: (len(members[shard]), -shard))
+            taken.append(members[donor].pop())
+        members.append(taken)
+
+    table = [0] * ROUTE_COUNT
+    for shard, routes in enumerate(members):
+        for route in routes:
+            table[route] = shard
+
+    return tuple(table)
+
+
+STRATEGIES: dict[str, Callable[[int], tuple[int, ...]]] = {
+    "modulo": modulo_table,
+    "range": range_table,
+    "jump": jump_table,
+    "balanced": balanced_table,
+}
+
+
+@cache
+def shard_table(shard_count: int, strategy: str | Callable[[int], tuple[int, ...]] = "modulo") -> tuple[int, ...]:
+    """Return the 256 entry route to shard table for the named (or callable) strategy; cached per pair."""
+    if callable(strategy):
+        table = tuple(strategy(shard_count))
+    elif strategy in STRATEGIES:
+        table = STRATEGIES[strategy](shard_count)
+    else:
+        msg = f"unknown shard strategy {strategy!r}, use one of {', '.join(STRATEGIES)}"
+        raise ValueError(msg)
+
+    if len(table) != ROUTE_COUNT or not all(0 <= shard < shard_count for shard in table):
+        msg = f"shard strategy {strategy!r} must map all {ROUTE_COUNT} routes to 0..{shard_count - 1}"
+        raise ValueError(msg)
+
+    return table
+
+
+def movement(
+    old_count: int,
+    new_count: int,
+    strategy: str | Callable[[int], tuple[int, ...]] = "modulo",
+    keys: Optional[Iterable[str]] = None,
+) -> dict[str, Any]:
+    """Report how many routes, and optionally keys, change shard when going from old_count to new_count shards."""
+    old = shard_table(old_count, strategy)
+    new = shard_table(new_count, strategy)
+    moved = [route for route in range(ROUTE_COUNT) if old[route] != new[route]]
+
+    report: dict[str, Any] = {
+        "strategy": strategy if isinstance(strategy, str) else getattr(strategy, "__name__", repr(strategy)),
+        "old_count": old_count,
+        "new_count": new_count,
+        "routes_moved": len(moved),
+        "route_fraction": len(moved) / ROUTE_COUNT,
+        "shard_sizes": [new.count(shard) for shard in range(new_count)],
+    }
+
+    if keys is not None:
+        lookup = route_lookup(tuple(int(old[route] != new[route]) for route in range(ROUTE_COUNT)))
+        total = moved_keys = 0
+        for key in keys:
+            total += 1
+            moved_keys += lookup[key[ROUTE_OFFSET : ROUTE_OFFSET + 2]]
+
+        report["keys"] = total
+        report["keys_moved"] = moved_keys
+        report["key_fraction"] = moved_keys / total if total else 0.0
+
+    return report
+
+
+def route_lookup(table: tuple[int, ...]) -> dict[str, int]:
+    """Return the hex route text to shard lookup, lower and upper case, for the shard table."""
+    lookup = dict(zip(HEX_ROUTES, table, strict=True))
+    lookup.update(zip((route.upper() for route in HEX_ROUTES), table, strict=True))
+    return lookup
+
+
+@cache
+def _table_bytes(table: tuple[int, ...]) -> tuple[bytes, bytes]:
+    """Return the low and high bytes of every shard in the table as two translate tables."""
+    return bytes(shard & 0xFF for shard in table), bytes(shard >> 8 for shard in table)
+
+
+def _parse_buffer(keys: bytes | bytearray | memoryview, table: tuple[int, ...], width: int) -> array:
+    """Return the shard numbers for a buffer of fixed-width keys.
+
+    Only the two route bytes of each key are copied out of the buffer; the routes and shards are
+    then built with bytes.translate, an integer OR of the nibbles and strided slice assignment.
+    """
+    view = memoryview(keys).cast("B")
+    if view.nbytes % width:
+        msg = f"buffer length {view.nbytes} is not a multiple of the key width {width}"
+        raise ValueError(msg)
+
+    high = view[ROUTE_OFFSET::width].tobytes().translate(HIGH_NIBBLES)
+    low = view[ROUTE_OFFSET + 1 :: width].tobytes().translate(NIBBLES)
+    if NOT_HEX in high or NOT_HEX in low:
+        msg = "buffer contains a key with a non-hex route"
+        raise ValueError(msg)
+
+    count = len(high)
+    routes = (int.from_bytes(high, "big") | int.from_bytes(low, "big")).to_bytes(count, "big")
+
+    low_bytes, high_bytes = _table_bytes(table)
+    first = 0 if sys.byteorder == "little" else 1
+    raw = bytearray(2 * count)
+    raw[first::2] = routes.translate(low_bytes)
+    raw[1 - first :: 2] = routes.translate(high_bytes)
+
+    shards = array("H")
+    shards.frombytes(raw)
+    return shards
+
+
+def _parse_numpy(keys: Any, table: tuple[int, ...]) -> Any:
+    """Return the shard numbers for a numpy array of fixed-width byte strings as a uint16 array."""
+    raw = np.ascontiguousarray(keys).view(np.uint8).reshape(-1, keys.dtype.itemsize)
+    nibbles = np.frombuffer(NIBBLES, dtype=np.uint8)
+    high = nibbles[raw[:, ROUTE_OFFSET]]
+    low = nibbles[raw[:, ROUTE_OFFSET + 1]]
+    if (high == NOT_HEX).any() or (low == NOT_HEX).any():
+        msg = "array contains a key with a non-hex route"
+        raise ValueError(msg)
+
+    shards = np.asarray(table, dtype=np.uint16)
+    return shards[(high.astype(np.uint16) << 4) | low]
+
+
+def parse_routes(keys: Any, table: tuple[int, ...], width: int = 16) -> Any:
+    """Return the shard number of each key using the 256 entry shard table.
+
+    A numpy array of byte strings returns a numpy uint16 array, everything else an array('H').
+    Buffers (bytes, bytearray, memoryview) hold back-to-back keys of width bytes each.
+    """
+    if np is not None and isinstance(keys, np.ndarray):
+        return _parse_numpy(keys, table)
+
+    if isinstance(keys, bytes | bytearray | memoryview):
+        return _parse_buffer(keys, table, width)
+
+    lookup = route_lookup(table)
+    current = None
+    try:
+        return array("H", [lookup[(current := key)[ROUTE_OFFSET : ROUTE_OFFSET + 2]] for key in keys])
+    except KeyError:
+        msg = f"key {current!r} has a non-hex route"
+        raise ValueError(msg) from None
+
+
+def bucket_routes(
+    keys: Iterable[str],
+    table: tuple[int, ...],
+    chunk_size: int = 65_536,
+) -> Iterator[dict[int, list[str]]]:
+    """Group keys by shard, yielding a dict of shard -> keys for every chunk_size keys read.
+
+    Only one chunk is held in memory at a time, so arbitrarily large key streams can be split
+    into per-shard outputs.
+    """
+    lookup = route_lookup(table)
+    buckets: dict[int, list[str]] = {}
+    count = 0
+
+    for key in keys:
+        try:
+            shard = lookup[key[ROUTE_OFFSET : ROUTE_OFFSET + 2]]
+        except KeyError:
+            msg = f"key {key!r} has a non-hex route"
+            raise ValueError(msg) from None
+
+        buckets.setdefault(shard, []).append(key)
+        count += 1
+
+        if count == chunk_size:
+            yield buckets
+            buckets, count = {}, 0
+
+    if buckets:
+        yield buckets
+
+
+def main(args: list[str]) -> None:
+    """Print the route movement between two shard counts for every strategy."""
+    old_count, new_count = (int(arg) for arg in args[:2])
+    for strategy in STRATEGIES:
+        report = movement(old_count, new_count, strategy)
+        sizes = report["shard_sizes"]
+        print(
+            f"{strategy:<10} {old_count} -> {new_count} shards: {report['routes_moved']:3d} routes moved "
+            f"({report['route_fraction']:.1%}), routes per shard {min(sizes)}..{max(sizes)}",
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
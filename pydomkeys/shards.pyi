@@ -0,0 +1,34 @@
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, Optional
+
+ROUTE_COUNT: int
+HEX_ROUTES: tuple[str, ...]
+ROUTE_OFFSET: int
+NOT_HEX: int
+NIBBLES: bytes
+HIGH_NIBBLES: bytes
+
+def modulo_table(shard_count: int) -> tuple[int, ...]: ...
+def range_table(shard_count: int) -> tuple[int, ...]: ...
+def jump_hash(key: int, buckets: int) -> int: ...
+def jump_table(shard_count: int) -> tuple[int, ...]: ...
+def balanced_table(shard_count: int) -> tuple[int, ...]: ...
+
+STRATEGIES: dict[str, Callable[[int], tuple[int, ...]]]
+
+def shard_table(shard_count: int, strategy: str | Callable[[int], tuple[int, ...]] = ...) -> tuple[int, ...]: ...
+def movement(
+    old_count: int,
+    new_count: int,
+    strategy: str | Callable[[int], tuple[int, ...]] = ...,
+    keys: Optional[Iterable[str]] = ...,
+) -> dict[str, Any]: ...
+def route_lookup(table: tuple[int, ...]) -> dict[str, int]: ...
+def parse_routes(keys: Any, table: tuple[int, ...], width: int = ...) -> array | Any: ...
+def bucket_routes(
+    keys: Iterable[str],
+    table: tuple[int, ...],
+    chunk_size: int = ...,
+) -> Iterator[dict[int, list[str]]]: ...
+def main(args: list[str]) -> None: ...
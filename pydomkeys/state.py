@@ -0,0 +1,103 @@
+"""A library for domain entity key generation identifiers.
+
+This module persists the last timestamp and counter a KeyGen issued in a small memory-mapped
+file, so a restarted worker resumes past its previous keys instead of a random counter start.
+The state is written into the map every interval keys (a few bytes copied into the page cache,
+which outlives a crash of the process) and only synced to disk by flush() and close().
+
+On startup a KeyGen with a state skips its counter past the saved count plus one interval,
+covering keys issued after the last checkpoint, and in monotonic mode never issues a timestamp
+at or below the saved one.
+
+Examples:
+--------
+    >>> import tempfile
+    >>> from pathlib import Path
+    >>> from pydomkeys.keys import KeyGen
+    >>> from pydomkeys.state import CounterState
+    >>> path = Path(tempfile.mkdtemp()) / "keygen.state"
+    >>> keygen = KeyGen.create("US", state=path, monotonic=True)
+    >>> keys = keygen.route_keys(1_000)
+    >>> keygen.state.close()
+    >>> restarted = KeyGen.create("US", state=path, monotonic=True)
+    >>> assert restarted.route_key()[4:] > max(key[4:] for key in keys)
+    >>> restarted.state.close()
+
+The module contains the following classes:
+- `CounterState` - the memory-mapped (timestamp, count) high-water mark of a KeyGen
+"""
+
+import mmap
+import struct
+from pathlib import Path
+from typing import Optional, Self
+
+MAGIC = b"pydomkey"
+STATE = struct.Struct("<8sqqq")
+
+
+class CounterState:
+    """CounterState keeps the last (timestamp, count) of a KeyGen in a memory-mapped file."""
+
+    def __init__(self, path: str | Path, interval: int = 4_096):
+        """Open or create the state file and read the saved state; checkpoint every interval keys."""
+        if interval < 1:
+            msg = f"checkpoint interval must be positive, not {interval}"
+            raise ValueError(msg)
+
+        self.path = Path(path)
+        self.interval = interval
+        self.pending = 0
+
+        self.path.touch(exist_ok=True)
+        self._file = self.path.open("r+b")
+        if self._file.seek(0, 2) < STATE.size:
+            self._file.truncate(STATE.size)
+        self._map = mmap.mmap(self._file.fileno(), STATE.size)
+
+        magic, timestamp, count, saved_interval = STATE.unpack_from(self._map)
+        self.saved: Optional[tuple[int, int, int]] = None
+        if magic == MAGIC:
+            self.saved = (timestamp, count, saved_interval)
+
+        self.timestamp, self.count = (timestamp, count) if self.saved else (-1, -1)
+
+    def __repr__(self):
+        """Show the path, last timestamp and count."""
+        return f"path: {self.path}, timestamp: {self.timestamp}, count: {self.count}"
+
+    def __enter__(self) -> Self:
+        """Return the state for use as a context manager."""
+        return self
+
+    def __exit__(self, *_args) -> None:
+        """Flush and close the state file."""
+        self.close()
+
+    def record(self, timestamp: int, count: int, size: int = 1) -> None:
+        """Remember the last issued (timestamp, count) of size keys and checkpoint every interval keys."""
+        self.timestamp, self.count = timestamp, count
+        self.pending += size
+        if self.pending >= self.interval:
+            self.checkpoint()
+
+    def checkpoint(self) -> None:
+        """Write the last (timestamp, count) into the map; no disk sync."""
+        STATE.pack_into(self._map, 0, MAGIC, self.timestamp, self.count, self.interval)
+        self.pending = 0
+
+    def flush(self) -> None:
+        """Checkpoint and sync the map to disk."""
+        self.checkpoint()
+        self._map.flush()
+
+    def close(self) -> None:
+        """Flush the exact last state and close the file."""
+        if self._map.closed:
+            return
+
+        if self.timestamp >= 0:
+            self.flush()
+
+        self._map.close()
+        self._file.close()
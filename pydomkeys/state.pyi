@@ -0,0 +1,21 @@
+import struct
+from pathlib import Path
+from typing import Optional, Self
+
+MAGIC: bytes
+STATE: struct.Struct
+
+class CounterState:
+    path: Path
+    interval: int
+    pending: int
+    saved: Optional[tuple[int, int, int]]
+    timestamp: int
+    count: int
+    def __init__(self, path: str | Path, interval: int = ...) -> None: ...
+    def __enter__(self) -> Self: ...
+    def __exit__(self, *_args) -> None: ...
+    def record(self, timestamp: int, count: int, size: int = ...) -> None: ...
+    def checkpoint(self) -> None: ...
+    def flush(self) -> None: ...
+    def close(self) -> None: ...
@@ -44,9 +44,17 @@ def refurb(ctx):
 def stress(ctx):
     ctx.run('poetry run ./tests/stress.py', pty=True)
 
+@task(name='stress-parallel')
+def stress_parallel(ctx):
+    ctx.run('poetry run ./tests/stress.py --parallel --partition', pty=True)
+
+@task
+def bench(ctx):
+    ctx.run('poetry run ./tests/bench.py', pty=True)
+
 @task
 def doctest(ctx):
-    ctx.run('poetry run python -m doctest pydomkeys/*.py', pty=True)
+    ctx.run('poetry run python -m doctest pydomkeys/[!_]*.py', pty=True)
     ctx.run('echo "\033[32;1;4mdoctest ok\033[0m"', pty=True)
 
 @task
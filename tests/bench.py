@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+
+"""Benchmark suite for the key generators.
+
+Each case reports throughput (ops/sec), per-call latency percentiles (p50/p99, with the timer
+overhead removed) and tracemalloc allocations (peak bytes and blocks still held after the run).
+Results can be written as json and compared against an earlier run to catch regressions:
+
+    ./tests/bench.py --json bench.json
+    ./tests/bench.py --baseline bench.json --threshold 0.15
+
+The command exits with status 1 when any case is slower than the baseline by more than threshold.
+"""
+
+import argparse
+import itertools
+import json
+import platform
+import statistics
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+from collections.abc import Callable
+from datetime import UTC, datetime
+from functools import partial
+from pathlib import Path
+
+from rich import print
+
+from pydomkeys import __version__
+from pydomkeys.base62 import Base62
+from pydomkeys.keys import Counter, DomainRouter, KeyGen, RouteGenerator, StripedCounter
+
+base62 = Base62()
+keygen = KeyGen.create("BM", 8)
+monotonic = KeyGen.create("BM", 8, monotonic=True)
+timestamp = time.time_ns() // 1_000
+count = 123_456
+
+
+def cases() -> dict[str, Callable[[], object]]:
+    """Return the single call cases by name."""
+    encoded = base62.encode(timestamp)
+    route_key = keygen.route_key()
+    router = DomainRouter("BM", 1)
+    buffered = DomainRouter("BM", 1, route_generator=RouteGenerator())
+
+    return {
+        "base62.encode": partial(base62.encode, timestamp),
+        "base62.encode_timestamp": partial(base62.encode_timestamp, timestamp),
+        "base62.encode_counter": partial(base62.encode_counter, count),
+        "base62.decode": partial(base62.decode, encoded),
+        "counter.next_count": Counter().next_count,
+        "router.route": router.route,
+        "router.route(buffered)": buffered.route,
+        "keygen.encode_timestamp": partial(keygen.encode_timestamp, timestamp),
+        "keygen.txkey": keygen.txkey,
+        "keygen.route_key": keygen.route_key,
+        "keygen.compile()": keygen.compile(),
+        "keygen.txkey(monotonic)": monotonic.txkey,
+        "keygen.route_key(monotonic)": monotonic.route_key,
+        "keygen.is_valid_route_key(strict)": partial(keygen.is_valid_route_key, route_key, strict=True),
+        "keygen.parse_route": partial(keygen.parse_route, route_key),
+        "keygen.parse_timestamp": partial(keygen.parse_timestamp, route_key),
+    }
+
+
+def timer_overhead(samples: int) -> int:
+    """Return the median nanoseconds of timing an empty call."""
+    clock = time.perf_counter_ns
+    timings = []
+    for _ in range(samples):
+        start = clock()
+        timings.append(clock() - start)
+
+    return int(statistics.median(timings))
+
+
+def measure(func: Callable[[], object], number: int, samples: int, overhead: int) -> dict[str, float]:
+    """Return the throughput, latency percentiles and allocations for func."""
+    best = min(timeit.Timer(func).repeat(repeat=3, number=number))
+
+    clock = time.perf_counter_ns
+    timings = []
+    for _ in range(samples):
+        start = clock()
+        func()
+        timings.append(max(clock() - start - overhead, 0))
+
+    percentiles = statistics.quantiles(timings, n=100)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    current, _ = tracemalloc.get_traced_memory()
+    for _ in range(samples):
+        func()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename"))
+
+    return {
+        "ops_per_sec": number / best,
+        "ns_per_op": best / number * 1_000_000_000,
+        "p50_ns": percentiles[49],
+        "p99_ns": percentiles[98],
+        "alloc_peak_bytes": peak - current,
+        "alloc_blocks_held": blocks,
+    }
+
+
+def bench_threads(number: int, max_threads: int = 8) -> dict[str, dict[str, float]]:
+    """Return the batch txkeys throughput with a StripedCounter for 1, 2, 4 ... max_threads threads."""
+    results = {}
+    thread_count = 1
+    while thread_count <= max_threads:
+        threaded = KeyGen(DomainRouter("BT", 1), counter=StripedCounter())
+        threads = [threading.Thread(target=threaded.txkeys, args=(number,)) for _ in range(thread_count)]
+
+        start = time.perf_counter_ns()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = (time.perf_counter_ns() - start) / 1_000_000_000
+
+        results[f"keygen.txkeys(threads={thread_count})"] = {"ops_per_sec": number * thread_count / elapsed}
+        thread_count *= 2
+
+    return results
+
+
+def stream_keys(total: int, chunk: int = 100_000):
+    """Return an iterator of total route keys that cycles one pre-generated chunk to keep memory flat."""
+    keys = keygen.route_keys(min(chunk, total))
+    repeats, remainder = divmod(total, len(keys))
+    return itertools.chain(itertools.chain.from_iterable(itertools.repeat(keys, repeats)), keys[:remainder])
+
+
+def bench_bulk(total: int) -> dict[str, dict[str, float]]:
+    """Return the per-key throughput of the bulk parsers over total streamed keys."""
+    runs = {
+        "keygen.parse_timestamps(bulk)": lambda keys: sum(1 for _ in keygen.parse_timestamps(keys)),
+        "base62.decode_many(bulk)": lambda keys: sum(1 for _ in base62.decode_many(key[4:13] for key in keys)),
+        "keygen.parse_routes(bulk)": lambda keys: len(keygen.parse_routes(keys)),
+        "keygen.filter_valid(bulk)": lambda keys: sum(1 for _ in keygen.filter_valid(keys)),
+    }
+
+    results = {}
+    for name, run in runs.items():
+        keys = stream_keys(total)
+        start = time.perf_counter_ns()
+        run(keys)
+        elapsed = time.perf_counter_ns() - start
+        results[name] = {"ops_per_sec": total / elapsed * 1_000_000_000, "ns_per_op": elapsed / total}
+
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Print the change in ops/sec against the baseline and return the names of regressed cases."""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+
+        ratio = result["ops_per_sec"] / base["ops_per_sec"]
+        color = "red" if ratio < 1 - threshold else "green3"
+        print(f"[{color}]{name:<36} {ratio:6.2f}x baseline")
+        if ratio < 1 - threshold:
+            regressions.append(name)
+
+    return regressions
+
+
+def main(args: list) -> int:
+    parser = argparse.ArgumentParser(description="pydomkeys benchmark suite")
+    parser.add_argument("--number", type=int, default=200_000, help="calls per throughput repeat")
+    parser.add_argument("--samples", type=int, default=20_000, help="individually timed calls for latency")
+    parser.add_argument("--bulk", type=int, default=0, help="streamed keys for the bulk parsers, e.g. 10000000")
+    parser.add_argument("--threads", type=int, default=0, help="benchmark 1, 2, 4 ... up to this many threads")
+    parser.add_argument("--only", default="", help="run only the cases whose name contains this text")
+    parser.add_argument("--json", type=Path, help="write the results to this json file")
+    parser.add_argument("--baseline", type=Path, help="compare against the results in this json file")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slow down before failing")
+    opts = parser.parse_args(args)
+
+    overhead = timer_overhead(opts.samples)
+    print(f"[yellow]timer overhead: {overhead} ns")
+
+    results = {}
+    for name, func in cases().items():
+        if opts.only not in name:
+            continue
+
+        result = measure(func, opts.number, opts.samples, overhead)
+        results[name] = result
+        print(
+            f"[yellow]{name:<32}[/yellow] {result['ops_per_sec']:14,.0f} ops/sec "
+            f"p50 {result['p50_ns']:7.0f} ns  p99 {result['p99_ns']:7.0f} ns  "
+            f"peak {result['alloc_peak_bytes']:6d} B  held {result['alloc_blocks_held']:4d} blocks",
+        )
+
+    extras = {}
+    if opts.threads:
+        extras.update(bench_threads(opts.number, opts.threads))
+    if opts.bulk:
+        extras.update(bench_bulk(opts.bulk))
+
+    for name, result in extras.items():
+        print(f"[yellow]{name:<32}[/yellow] {result['ops_per_sec']:14,.0f} ops/sec")
+    results.update(extras)
+
+    report = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "created": datetime.now(tz=UTC).isoformat(),
+        "results": results,
+    }
+
+    if opts.json:
+        opts.json.write_text(json.dumps(report, indent=2))
+        print(f"[green3]results written to {opts.json}")
+
+    if opts.baseline:
+        baseline = json.loads(opts.baseline.read_text())["results"]
+        regressions = compare(results, baseline, opts.threshold)
+        if regressions:
+            print(f"[red]regressions: {', '.join(regressions)}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
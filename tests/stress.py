@@ -2,17 +2,22 @@
 # dpw@plaza.localdomain
 # 2023-09-12 18:16:26
 
+import argparse
 import sys
 from rich import print
-from pydomkeys.keys import KeyGen
+from pydomkeys.keys import KeyGen, StripedCounter, pack_route_keys, unpack_route_keys
+from pydomkeys.keyset import KeySet
 import time
 import schedule
+import threading
+from concurrent.futures import ProcessPoolExecutor
 from functools import partial
+from multiprocessing import shared_memory
 
 shard_count = 4
 keygen = KeyGen.create("T1", shard_count)
 
-# TODO(dpw): add thread pool workers with mpire
+RECORD = 12
 
 
 def timer_decorator(func):
@@ -30,15 +35,14 @@ def timer_decorator(func):
 
 @timer_decorator
 def test_txkey(max_count: int) -> bool:
-    kset = set()
+    kset = KeySet()
 
     keys = (keygen.txkey() for _ in range(max_count))
 
     count = 0
     for key in keys:
         count += 1
-        kset.add(key)
-        assert len(kset) == count, f"key: {key} was not unique, count: {count}"
+        assert kset.add(key), f"key: {key} was not unique, count: {count}"
         assert len(key) == 12, f"txkey: {key} has incorrect length {len(key)}"
 
     return max_count == len(kset)
@@ -46,14 +50,13 @@ def test_txkey(max_count: int) -> bool:
 
 @timer_decorator
 def test_route_key(max_count: int) -> bool:
-    kset = set()
+    kset = KeySet()
     keys = (keygen.route_key() for _ in range(max_count))
 
     count = 0
     for key in keys:
         count += 1
-        kset.add(key)
-        assert len(kset) == count, f"route_key: {key} was not unique, count: {count}"
+        assert kset.add(key), f"route_key: {key} was not unique, count: {count}"
 
         assert (
             len(key) == 16
@@ -83,8 +86,119 @@ def run_loops(max_count: int = 500_000, loops: int = 5):
     print(f"[green3]Stress tests completed without error: ", end="")
 
 
+def parallel_worker(
+    shm_name: str,
+    process: int,
+    processes: int,
+    threads: int,
+    per_thread: int,
+    partition: bool,
+) -> int:
+    """Generate keys on threads in one process, pack them into the shared block and return the elapsed ns."""
+    if partition:
+        worker = KeyGen.create("T1", shard_count, worker_id=process, worker_count=processes)
+        worker.counter = StripedCounter.for_worker(process, processes)
+    else:
+        worker = KeyGen.create("T1", shard_count)
+        worker.counter = StripedCounter()
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    base = process * threads * per_thread * RECORD
+
+    results: list[list[str]] = [[] for _ in range(threads)]
+
+    def generate(thread: int) -> None:
+        results[thread] = [worker.route_key() for _ in range(per_thread)]
+
+    pool = [threading.Thread(target=generate, args=(n,)) for n in range(threads)]
+    start = time.perf_counter_ns()
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter_ns() - start
+
+    for thread, keys in enumerate(results):
+        offset = base + thread * per_thread * RECORD
+        shm.buf[offset : offset + per_thread * RECORD] = pack_route_keys(keys)
+
+    shm.close()
+    return elapsed
+
+
+def run_parallel(processes: int, threads: int, per_thread: int, partition: bool) -> dict:
+    """Run the workers into one shared memory block and check the merged keys for collisions."""
+    total = processes * threads * per_thread
+    shm = shared_memory.SharedMemory(create=True, size=total * RECORD)
+    try:
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            futures = [
+                executor.submit(parallel_worker, shm.name, n, processes, threads, per_thread, partition)
+                for n in range(processes)
+            ]
+            elapsed = max(future.result() for future in futures)
+
+        buffer = shm.buf[: total * RECORD]
+        kset = KeySet()
+        unique = kset.update(unpack_route_keys(buffer))
+
+        table = keygen.domain_router.shard_table
+        shards = [0] * shard_count
+        for route in bytes(buffer[2::RECORD]):
+            shards[table[route]] += 1
+
+        buffer.release()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    return {
+        "processes": processes,
+        "threads": threads,
+        "keys": total,
+        "collisions": total - unique,
+        "collision_rate": (total - unique) / total,
+        "keys_per_sec": total / elapsed * 1_000_000_000,
+        "shards": shards,
+    }
+
+
+@timer_decorator
+def test_parallel(max_processes: int, threads: int, per_thread: int, partition: bool) -> bool:
+    ok = True
+    processes = 1
+    while processes <= max_processes:
+        stats = run_parallel(processes, threads, per_thread, partition)
+        spread = [f"{count / stats['keys']:.1%}" for count in stats["shards"]]
+        color = "green3" if stats["collisions"] == 0 else "red"
+        print(
+            f"[{color}]{processes} procs x {threads} threads: {stats['keys']:,} keys, "
+            f"{stats['keys_per_sec']:,.0f} keys/sec, collisions {stats['collisions']} "
+            f"({stats['collision_rate']:.6%}), shards {spread}",
+        )
+        ok = ok and stats["collisions"] == 0
+        processes *= 2
+
+    return ok
+
+
 def main(args: list) -> None:
-    if "--at" in args:
+    if "--parallel" in args:
+        parser = argparse.ArgumentParser(description="parallel collision stress test")
+        parser.add_argument("--parallel", action="store_true")
+        parser.add_argument("--processes", type=int, default=4, help="scale 1, 2, 4 ... up to this many processes")
+        parser.add_argument("--threads", type=int, default=4, help="threads per process")
+        parser.add_argument("--count", type=int, default=50_000, help="keys per thread")
+        parser.add_argument("--partition", action="store_true", help="give each process its own counter range")
+        opts = parser.parse_args(args)
+
+        print("Running the parallel stress test...")
+        ok = test_parallel(opts.processes, opts.threads, opts.count, opts.partition)
+        if opts.partition and not ok:
+            print("[red]ERROR! partitioned workers produced colliding keys")
+            sys.exit(1)
+
+    elif "--at" in args:
         looper = partial(run_loops, max_count=500_000, loops=12)
 
         schedule.every().minute.at(":15").do(looper)
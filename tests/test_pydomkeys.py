@@ -2,14 +2,32 @@
 # dpw@plaza.localdomain
 # 2023-08-26 23:48:35
 
+import asyncio
+import gc
+import io
+import json
+import os
+import socket
+import string
 import sys
+import threading
+import time
+import tomllib
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
 from rich.console import Console
-from datetime import datetime
 
-from pydomkeys.keys import KeyGen, Counter, DomainRouter
+from pydomkeys import analyze, cli, shards
+from pydomkeys import keys as domkeys
 from pydomkeys.base62 import Base62
-from pathlib import Path
-import tomllib
+from pydomkeys.keys import HEX_ROUTES, Counter, DomainRouter, KeyGen, RouteGenerator, StripedCounter
+from pydomkeys.keyset import KeySet
+from pydomkeys.lease import LeasedCounter, LeaseServer
+from pydomkeys.pool import KeyPool
+from pydomkeys.registry import KeyGenRegistry
+from pydomkeys.state import CounterState
 
 console = Console()
 
@@ -50,6 +68,17 @@ def test_txkey():
         console.log(f"{n} {key=}")
 
 
+def test_encode_timestamp_cache():
+    base62 = Base62()
+    keygen = KeyGen.create("tt")
+    start = (time.time_ns() // 1_000 // 3_844) * 3_844 - 5
+    for micros in [*range(start, start + 20), start + 7_700, start, 62**9 + 1, 3_843, 62]:
+        assert keygen.encode_timestamp(micros) == base62.encode(micros)
+        assert keygen.txkey(micros)[:-3] == base62.encode(micros)
+
+    assert keygen.route_key(start)[4:13] == base62.encode(start)
+
+
 def test_is_valid_route_key():
     """Test if the route key is valid"""
     router = DomainRouter("T0", 4)
@@ -99,6 +128,64 @@ def test_counter():
     assert n == n_min
 
 
+def test_striped_counter():
+    counter = StripedCounter(stripes=8)
+    console.log(counter)
+    assert counter.span() == (238_000 - 3_850 + 1) // 8
+
+    results = {}
+
+    def worker(name):
+        results[name] = counter.next_counts(500) + [counter.next_count() for _ in range(500)]
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    counts = [n for values in results.values() for n in values]
+    assert len(counts) == 8_000
+    assert len(set(counts)) == 8_000
+    assert all(counter.min <= n <= counter.max for n in counts)
+
+    assert counter.reset() == counter.min
+    assert all(stripe.count == stripe.min for stripe, _ in counter.stripes)
+
+    with pytest.raises(ValueError):
+        StripedCounter(10, 15, 8)
+
+    keygen = KeyGen(DomainRouter("tt", 1), counter=StripedCounter(3_850, 3_900, 4))
+    keys = keygen.txkeys(100)
+    assert len(set(keys)) == 100
+
+
+def test_counter_for_worker():
+    worker_count = 32
+    counters = [Counter.for_worker(n, worker_count) for n in range(worker_count)]
+    assert counters[0].min == 3_850
+    assert counters[-1].max == 238_000
+    for lower, upper in zip(counters, counters[1:]):
+        assert lower.max + 1 == upper.min
+    assert all(counter.min <= counter.count <= counter.max for counter in counters)
+
+    striped = StripedCounter.for_worker(1, 4)
+    assert isinstance(striped, StripedCounter)
+    assert striped.min == 3_850 + (238_000 - 3_850 + 1) // 4
+
+    for worker_id, count in [(-1, 4), (4, 4), (0, 300_000)]:
+        with pytest.raises(ValueError):
+            Counter.for_worker(worker_id, count)
+
+    keygens = [KeyGen.create("WK", worker_id=n, worker_count=4) for n in range(4)]
+    micros = time.time_ns() // 1_000
+    keys = {keygen.txkey(micros) for keygen in keygens for _ in range(1_000)}
+    assert len(keys) == 4_000
+
+    with pytest.raises(ValueError):
+        KeyGen.create("WK", worker_id=1)
+
+
 def test_domain_router():
     dom = "US"
     shard_count = 4
@@ -138,7 +225,46 @@ def test_base62():
     assert len(enc) == 9
 
     n = base62.decode(enc)
-    assert n == 0
+    assert n == ds
+
+
+def test_base62_encode_fixed():
+    base62 = Base62()
+    timestamps = [62**8, 62**9 - 1, 946684800000000, time.time_ns() // 1_000]
+    for n in timestamps:
+        assert base62.encode_timestamp(n) == base62.encode(n)
+        assert base62.encode_fixed(n, 9) == base62.encode(n)
+
+    for n in [0, 61, 62, 3_843, 3_844, 3_850, 123_456, 238_000, 62**3 - 1, 62**3]:
+        assert base62.encode_counter(n) == base62.encode(n)
+        assert base62.encode_fixed(n, 3) == base62.encode(n)
+
+    for width in range(1, 12):
+        n = 62 ** (width - 1) + 12_345
+        assert base62.encode_fixed(n, width) == base62.encode(n)
+
+    base36 = Base62("0123456789abcdefghijklmnopqrstuvwxyz")
+    assert base36.encode_counter(12_345) == base36.encode(12_345)
+    assert base36.encode_timestamp(946684800000000) == base36.encode(946684800000000)
+
+
+def test_base62_decode():
+    base62 = Base62()
+    for n in [0, 1, 61, 62, 3_850, 238_000, 946684800000000, 62**12 + 7]:
+        assert base62.decode(base62.encode(n)) == n
+
+    keygen = KeyGen.create("US")
+    keys = keygen.txkeys(100)
+    stamps = list(base62.decode_many(key[:9] for key in keys))
+    assert stamps == [base62.decode(key[:9]) for key in keys]
+    assert list(base62.decode_many([])) == []
+
+    for bad in ["12-4", "ab cd"]:
+        with pytest.raises(ValueError):
+            base62.decode(bad)
+
+    with pytest.raises(ValueError):
+        list(base62.decode_many(["abc", "a!c"]))
 
 
 def test_route_key():
@@ -170,6 +296,883 @@ def test_parse_route():
     assert shard < shard_count
 
 
+def test_next_counts():
+    counter = Counter(10, 15, 13)
+    counts = counter.next_counts(8)
+    assert counts == [14, 15, 10, 11, 12, 13, 14, 15]
+    assert counter.count == 15
+    assert counter.next_count() == 10
+
+    counter = Counter(10, 15, 13)
+    expected = [counter.next_count() for _ in range(20)]
+    counter = Counter(10, 15, 13)
+    assert counter.next_counts(20) == expected
+    assert counter.next_counts(0) == []
+
+
+def test_routes():
+    domr = DomainRouter("US", 4)
+    routes = domr.routes(1_000)
+    assert len(routes) == 1_000
+    assert all(len(route) == 2 and int(route, 16) < 256 for route in routes)
+
+
+def test_route_generator():
+    generator = RouteGenerator(buffer_size=64)
+    console.log(generator)
+    routes = [generator() for _ in range(25_600)]
+    assert all(len(route) == 2 and int(route, 16) < 256 for route in routes)
+
+    # 100 per route on average, allow plenty of slack for the uniformity check
+    counts = {route: routes.count(route) for route in set(routes)}
+    assert len(counts) == 256
+    assert min(counts.values()) > 40
+    assert max(counts.values()) < 180
+
+    generator = RouteGenerator(buffer_size=4, source=os.urandom)
+    domr = DomainRouter("US", 4, route_generator=generator)
+    assert len({domr.route() for _ in range(10)} - set(HEX_ROUTES)) == 0
+    assert len(domr.routes(100)) == 100
+
+    keygen = KeyGen(domr)
+    assert keygen.is_valid_route_key(keygen.route_key())
+
+
+def test_txkeys():
+    keygen = KeyGen(DomainRouter("tt", 1), counter=Counter(3_850, 3_860))
+    keys = keygen.txkeys(100)
+    assert len(keys) == 100
+    assert len(set(keys)) == 100
+    assert all(len(key) == 12 for key in keys)
+
+    buffer = [""] * 120
+    out = keygen.txkeys(100, buffer)
+    assert out is buffer
+    assert len(buffer) == 120
+    assert all(len(key) == 12 for key in buffer[:100])
+    assert buffer[100] == ""
+
+    with pytest.raises(ValueError):
+        keygen.txkeys(10, [""] * 5)
+
+
+def test_route_keys():
+    shard_count = 4
+    keygen = KeyGen.create("us", shard_count)
+    keys = keygen.route_keys(10_000)
+    assert len(set(keys)) == 10_000
+    for key in keys:
+        assert keygen.is_valid_route_key(key)
+        assert keygen.parse_route(key) < shard_count
+
+    buffer = [""] * 10
+    assert keygen.route_keys(10, buffer) is buffer
+    assert all(key.startswith("us") for key in buffer)
+
+
+def test_parse_routes():
+    shard_count = 6
+    keygen = KeyGen.create("us", shard_count)
+    keys = keygen.route_keys(1_000)
+    expected = [keygen.parse_route(key) for key in keys]
+
+    assert list(keygen.parse_routes(keys)) == expected
+    assert list(keygen.parse_routes(key for key in keys)) == expected
+    assert list(keygen.parse_routes("".join(keys).encode())) == expected
+    assert list(keygen.parse_routes(memoryview("".join(keys).encode()))) == expected
+    assert list(keygen.parse_routes("\n".join(keys).encode() + b"\n", width=17)) == expected
+    assert list(keygen.parse_routes(["usFFabc"])) == [255 % shard_count]
+    assert list(keygen.parse_routes(bytearray(b"usFFabcus0Aabc"), width=7)) == [255 % shard_count, 10 % shard_count]
+
+    wide = shards.shard_table(1_000, "jump")
+    assert list(shards.parse_routes("".join(keys).encode(), wide)) == list(shards.parse_routes(keys, wide))
+
+    for bad in [["usZZ0000000000000"], b"usZZ000000000000", b"us0000"]:
+        with pytest.raises(ValueError):
+            keygen.parse_routes(bad)
+
+    buckets = list(keygen.bucket_routes(keys, chunk_size=300))
+    assert len(buckets) == 4
+    assert sum(len(bucket) for chunk in buckets for bucket in chunk.values()) == 1_000
+    for chunk in buckets:
+        for shard, bucket in chunk.items():
+            assert all(keygen.parse_route(key) == shard for key in bucket)
+
+    with pytest.raises(ValueError):
+        list(keygen.bucket_routes(["usxx"]))
+
+    with pytest.raises(ValueError):
+        shards.modulo_table(0)
+
+
+def test_shard_strategies():
+    for shard_count in [1, 3, 4, 5, 6, 12, 256, 300]:
+        for strategy in shards.STRATEGIES:
+            table = shards.shard_table(shard_count, strategy)
+            assert len(table) == 256
+            assert all(0 <= shard < shard_count for shard in table)
+
+        assert shards.shard_table(shard_count) == tuple(route % shard_count for route in range(256))
+
+    for shard_count in [3, 5, 6, 12]:
+        for strategy in ["modulo", "range", "balanced"]:
+            sizes = shards.movement(shard_count, shard_count, strategy)["shard_sizes"]
+            assert max(sizes) - min(sizes) <= 1
+
+    # growing only moves routes onto the new shards
+    for old_count, new_count in [(1, 2), (4, 6), (5, 6), (6, 12)]:
+        report = shards.movement(old_count, new_count, "balanced")
+        assert report["routes_moved"] == sum(report["shard_sizes"][old_count:])
+        assert report["routes_moved"] <= -(-256 // new_count) * (new_count - old_count)
+
+    keygen = KeyGen.create("RS", 6, strategy="balanced")
+    keys = keygen.route_keys(1_000)
+    table = shards.balanced_table(6)
+    assert all(keygen.parse_route(key) == table[int(key[2:4], 16)] for key in keys)
+    assert list(keygen.parse_routes(keys)) == [keygen.parse_route(key) for key in keys]
+
+    report = shards.movement(6, 8, "balanced", keys)
+    assert report["keys"] == 1_000
+    assert 0 < report["keys_moved"] < 1_000
+
+    router = DomainRouter("RS", 2, strategy=lambda count: [0] * 128 + [1] * 128)
+    assert router.shard_table[127] == 0
+    assert router.shard_table[128] == 1
+
+    # changing the shard count or strategy rebuilds the table used by parse_route
+    keygen = KeyGen.create("RS", 1)
+    keygen.domain_router.shard_count = 8
+    assert keygen.parse_route("RS0f" + "0" * 12) == 15 % 8
+    keygen.domain_router.strategy = "range"
+    assert keygen.parse_route("RS0f" + "0" * 12) == 0
+    assert keygen.parse_route("RSff" + "0" * 12) == 7
+
+    with pytest.raises(ValueError):
+        DomainRouter("RS", 2, strategy="bogus")
+
+    with pytest.raises(ValueError):
+        DomainRouter("RS", 2, strategy=lambda count: [2] * 256)
+
+
+def test_parse_routes_numpy():
+    np = pytest.importorskip("numpy")
+    keygen = KeyGen.create("us", 5)
+    keys = keygen.route_keys(1_000)
+    shard_array = keygen.parse_routes(np.array(keys, dtype="S16"))
+    assert shard_array.dtype == np.uint16
+    assert shard_array.tolist() == [keygen.parse_route(key) for key in keys]
+
+    with pytest.raises(ValueError):
+        keygen.parse_routes(np.array(["usZZ000000000000"], dtype="S16"))
+
+
+def test_parse_timestamp():
+    keygen = KeyGen.create("TS", 4)
+    micros = time.time_ns() // 1_000
+    route_key = keygen.route_key(micros)
+    txkey = keygen.txkey(micros)
+
+    assert keygen.parse_timestamp(route_key) == micros
+    assert keygen.parse_timestamp(txkey) == micros
+
+    dt = keygen.parse_datetime(route_key)
+    assert dt.tzinfo == timezone.utc
+    assert dt == datetime.fromtimestamp(micros // 1_000_000, tz=timezone.utc).replace(microsecond=micros % 1_000_000)
+
+    with pytest.raises(ValueError):
+        keygen.parse_timestamp("short")
+
+    stamps = [micros + n * 997 for n in range(10_000)]
+    keys = [keygen.route_key(stamp) if n % 2 else keygen.txkey(stamp) for n, stamp in enumerate(stamps)]
+    assert list(keygen.parse_timestamps(keys)) == stamps
+    assert list(keygen.parse_timestamps(keys[:10], as_datetime=True)) == [keygen.parse_datetime(key) for key in keys[:10]]
+
+    for bad in [["TS00" + txkey[:7] + "!!" + txkey[9:]], ["TS00!!!!!!!!!!!!"]]:
+        with pytest.raises(ValueError):
+            list(keygen.parse_timestamps(bad))
+
+
+def test_key_range():
+    keygen = KeyGen.create("KR", 4)
+    start = datetime(2023, 10, 18, 18, tzinfo=timezone.utc)
+    end = datetime(2023, 10, 18, 19, tzinfo=timezone.utc)
+    lo, hi = keygen.key_range(start, end)
+    assert len(lo) == len(hi) == 12
+    assert keygen.key_range(start.replace(tzinfo=None), end.replace(tzinfo=None)) == (lo, hi)
+
+    first = int(start.timestamp()) * 1_000_000
+    last = int(end.timestamp()) * 1_000_000
+    inside = [keygen.txkey(first), keygen.txkey(first + 1_234_567), keygen.txkey(last - 1)]
+    outside = [keygen.txkey(first - 1), keygen.txkey(last)]
+    assert all(lo <= key <= hi for key in inside)
+    assert not any(lo <= key <= hi for key in outside)
+
+    ranges = keygen.route_key_ranges(start, end)
+    assert len(ranges) == 256
+    key = keygen.route_key(first + 42)
+    route_lo, route_hi = ranges[int(key[2:4], 16)]
+    assert route_lo <= key <= route_hi
+    assert route_lo[:4] == key[:4]
+
+    with pytest.raises(ValueError):
+        keygen.key_range(end, start)
+
+    unsorted = KeyGen(DomainRouter("KR", 1), base62=Base62(string.ascii_lowercase + string.digits))
+    with pytest.raises(ValueError):
+        unsorted.key_range(start, end)
+
+
+def test_pack_keys():
+    keygen = KeyGen.create("PK", 4)
+    txkeys = keygen.txkeys(1_000)
+    packed = [domkeys.pack_txkey(key) for key in txkeys]
+    assert all(n < 1 << 72 for n in packed)
+    assert [domkeys.unpack_txkey(n) for n in packed] == txkeys
+    assert sorted(packed) == [domkeys.pack_txkey(key) for key in sorted(txkeys)]
+
+    route_keys = keygen.route_keys(1_000)
+    for key in route_keys[:100]:
+        data = domkeys.pack_route_key(key)
+        assert len(data) == 12
+        assert domkeys.unpack_route_key(data) == key
+
+    buffer = domkeys.pack_route_keys(route_keys)
+    assert isinstance(buffer, bytearray)
+    assert len(buffer) == 12 * 1_000
+    assert list(domkeys.unpack_route_keys(buffer)) == route_keys
+    assert list(domkeys.unpack_route_keys(memoryview(buffer)[12:24])) == route_keys[1:2]
+    assert sorted(bytes(buffer[n : n + 12]) for n in range(0, len(buffer), 12)) == [
+        domkeys.pack_route_key(key) for key in sorted(route_keys)
+    ]
+
+    for call, bad in [
+        (domkeys.pack_txkey, "short"),
+        (domkeys.pack_route_key, "short"),
+        (domkeys.unpack_route_key, b"short"),
+        (domkeys.pack_route_keys, ["short"]),
+        (domkeys.pack_route_key, "PK4E" + route_keys[0][4:]),
+        (domkeys.pack_route_keys, ["PKzz" + route_keys[0][4:]]),
+    ]:
+        with pytest.raises(ValueError):
+            call(bad)
+
+    with pytest.raises(ValueError):
+        list(domkeys.unpack_route_keys(b"x" * 13))
+
+
+def test_keyset():
+    keygen = KeyGen.create("KS", 4)
+    route_keys = keygen.route_keys(5_000)
+    txkeys = keygen.txkeys(1_000)
+
+    kset = KeySet(route_keys)
+    console.log(kset)
+    assert len(kset) == 5_000
+    assert all(key in kset for key in route_keys)
+    assert not any(key in kset for key in keygen.route_keys(100))
+    assert not kset.add(route_keys[0])
+    assert len(kset) == 5_000
+    assert 42 not in kset
+    assert "bad" not in kset
+
+    assert kset.update(txkeys) == 1_000
+    assert txkeys[0] in kset
+    assert len([partition for partition in kset.partitions if len(partition) == 1]) > 1
+    assert sorted(kset) == sorted(route_keys + txkeys)
+    assert kset.nbytes <= 32 * len(kset) + 64 * 12 * len(kset.partitions)
+
+    other = KeySet(route_keys[:10] + keygen.route_keys(10))
+    assert kset.merge(other) == 10
+    assert len(kset) == 6_010
+    assert all(key in kset for key in other)
+
+    alphabet = string.ascii_lowercase + string.digits + string.ascii_uppercase
+    shuffled = KeySet(route_keys[:10] + keygen.route_keys(10), base62=Base62(alphabet))
+    assert kset.merge(shuffled) == 10
+    assert all(key in kset for key in shuffled)
+
+    with pytest.raises(ValueError):
+        kset.add("bad")
+
+
+def test_metrics():
+    keygen = KeyGen(DomainRouter("MT", 4), counter=Counter(3_850, 3_859, 3_850))
+    assert keygen.snapshot() == {"domain": "MT", "counter_rollovers": 0}
+
+    metrics = keygen.enable_metrics()
+    assert keygen.enable_metrics() is metrics
+
+    micros = time.time_ns() // 1_000
+    for stamp in [micros, micros, micros + 1, micros - 5, micros - 5]:
+        keygen.txkey(stamp)
+    keygen.route_key(micros + 10)
+    keygen.route_keys(20)
+
+    snapshot = keygen.snapshot()
+    console.log(snapshot)
+    assert snapshot["keys"] == 26
+    assert snapshot["txkeys"] == 5
+    assert snapshot["route_keys"] == 21
+    assert snapshot["clock_regressions"] >= 1
+    assert snapshot["bursts"] >= 2 + 18
+    assert snapshot["counter_rollovers"] == keygen.counter.rollovers >= 2
+    assert sum(snapshot["routes"].values()) == 21
+    assert sum(snapshot["shards"].values()) == 21
+    assert set(snapshot["shards"]) <= {0, 1, 2, 3}
+
+    metrics.reset()
+    assert keygen.snapshot()["keys"] == 0
+
+    keygen.disable_metrics()
+    keygen.route_key()
+    assert "keys" not in keygen.snapshot()
+
+    striped = KeyGen(DomainRouter("MT", 1), counter=StripedCounter(3_850, 3_865, 2))
+    striped.txkeys(50)
+    assert striped.snapshot()["counter_rollovers"] >= 5
+
+
+def test_monotonic_batches(monkeypatch):
+    micros = time.time_ns() // 1_000
+    monkeypatch.setattr(time, "time_ns", lambda: micros * 1_000)
+
+    # two generators batching in the same microsecond take their counts from a shared counter
+    counter = Counter(3_850, 238_000, 3_850)
+    first = KeyGen(DomainRouter("MB", 1), counter=counter, monotonic=True)
+    second = KeyGen(DomainRouter("MB", 1), counter=counter, monotonic=True)
+    keys = first.txkeys(1_000) + second.txkeys(1_000)
+    assert len(set(keys)) == 2_000
+    assert all(first.parse_timestamp(key) == micros for key in keys)
+
+    # a rollover inside a chunk moves the rest of it to the next microsecond
+    keygen = KeyGen(DomainRouter("MB", 1), counter=Counter(3_850, 3_859, 3_855), monotonic=True)
+    keys = keygen.txkeys(25) + [keygen.txkey()]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == 26
+    assert [keygen.parse_timestamp(key) - micros for key in keys[:6]] == [0, 0, 0, 0, 1, 1]
+
+
+def test_monotonic():
+    keygen = KeyGen(DomainRouter("MO", 1), counter=Counter(3_850, 3_859), monotonic=True)
+    micros = time.time_ns() // 1_000
+
+    # a burst that exhausts the counter, then the clock steps backwards
+    stamps = [micros] * 25 + [micros - 1_000] * 5 + [micros + 100, micros + 100]
+    keys = [keygen.txkey(stamp) for stamp in stamps]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+    assert keygen.parse_timestamp(keys[-2]) == micros + 100
+
+    keys += keygen.txkeys(35)
+    keys += [keygen.txkey(micros - 5_000)]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+    keygen = KeyGen.create("MO", 4, monotonic=True)
+    keys = [keygen.txkey() for _ in range(5_000)] + keygen.txkeys(5_000)
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(keys)
+
+    route_keys = [keygen.route_key() for _ in range(100)]
+    assert [key[4:] for key in route_keys] == sorted(key[4:] for key in route_keys)
+    assert keygen.monotonic
+
+
+def test_compile():
+    keygen = KeyGen.create("CP", 4)
+    route_key = keygen.compile()
+    before = time.time_ns() // 1_000
+    keys = [route_key() for _ in range(5_000)] + [keygen.route_key() for _ in range(1_000)]
+    after = time.time_ns() // 1_000
+
+    assert len(set(keys)) == len(keys)
+    assert all(len(key) == 16 and key.startswith("CP") for key in keys)
+    assert all(keygen.is_valid_route_key(key) for key in keys)
+    assert all(before <= keygen.parse_timestamp(key) <= after for key in keys)
+    assert set(keygen.parse_routes(keys)) <= {0, 1, 2, 3}
+
+    # the compiled function shares the counter, including roll-overs
+    keygen = KeyGen(DomainRouter("CP", 1), counter=Counter(3_850, 3_859, start=3_858))
+    route_key = keygen.compile()
+    suffixes = [route_key()[-3:] for _ in range(3)]
+    assert [keygen.base62.decode(suffix) for suffix in suffixes] == [3_859, 3_850, 3_851]
+    assert keygen.counter.count == 3_851
+    assert keygen.counter.rollovers == 1
+
+    striped = KeyGen(DomainRouter("CP", 1), counter=StripedCounter())
+    assert striped.is_valid_route_key(striped.compile()())
+
+    keygen = KeyGen.create("CP", 4, monotonic=True)
+    assert keygen.compile() == keygen.route_key
+    with pytest.raises(AttributeError):
+        keygen.extra = 1
+
+
+def test_registry():
+    registry = KeyGenRegistry(["US", "CU", "OR"], shard_count=4)
+    orders = registry.register("IN", 8, strategy="balanced")
+    console.log(registry)
+    assert len(registry) == 4
+    assert "IN" in registry and "XX" not in registry
+    assert list(registry) == ["US", "CU", "OR", "IN"]
+    assert registry["IN"] is orders
+    assert orders.domain_router.shard_count == 8
+    assert not orders.monotonic
+
+    ledger = KeyGenRegistry(["GL"], monotonic=True)
+    assert ledger["GL"].monotonic
+    assert not ledger.register("AP", monotonic=False).monotonic
+
+    # the generators share the alphabet tables and the buffered route generator
+    assert all(registry[domain].base62 is registry.base62 for domain in registry)
+    assert all(registry[domain].domain_router.route_generator is registry.route_generator for domain in registry)
+
+    micros = time.time_ns() // 1_000
+    keys = registry.route_keys(["US", "CU", "OR", "IN"] * 25, micros)
+    assert len(set(keys)) == 100
+    assert all(registry.is_valid_route_key(key) for key in keys)
+    assert all(registry.parse_timestamp(key) == micros for key in keys)
+    for key in keys:
+        keygen = registry.keygen_for(key)
+        assert keygen.domain_router.domain() == key[:2]
+        assert registry.parse_route(key) == keygen.parse_route(key)
+
+    assert registry.parse_datetime(keys[0]) == registry["US"].parse_datetime(keys[0])
+    assert not registry.is_valid_route_key("XX" + keys[0][2:])
+    assert not registry.is_valid_route_key(None)
+
+    with pytest.raises(ValueError):
+        registry.parse_route("XX" + keys[0][2:])
+    with pytest.raises(ValueError):
+        registry.register("US")
+    with pytest.raises(ValueError):
+        registry.register("USA")
+    with pytest.raises(KeyError):
+        registry.route_key("XX")
+
+
+def test_cli(tmp_path, capsys, monkeypatch):
+    keys_file = tmp_path / "keys.txt"
+    assert cli.main(["gen", "1000", "-d", "CL", "-s", "4", "--batch", "300", "-o", str(keys_file)]) == 0
+    keys = keys_file.read_text().split()
+    assert len(set(keys)) == 1000
+    assert all(len(key) == 16 and key.startswith("CL") for key in keys)
+
+    assert cli.main(["gen", "10", "--txkey"]) == 0
+    assert all(len(key) == 12 for key in capsys.readouterr().out.split())
+
+    keygen = KeyGen.create("CL", 4)
+    monkeypatch.setattr(sys, "stdin", io.StringIO("\n".join(keys) + "\n\n"))
+    assert cli.main(["route", "-s", "4", "--batch", "128"]) == 0
+    assert [int(shard) for shard in capsys.readouterr().out.split()] == [keygen.parse_route(key) for key in keys]
+
+    split = tmp_path / "shards"
+    assert cli.main(["route", "-s", "4", "-i", str(keys_file), "--split", str(split), "--batch", "100"]) == 0
+    total = 0
+    for path in split.iterdir():
+        shard_keys = path.read_text().split()
+        shard = int(path.stem.split("-")[1])
+        assert all(keygen.parse_route(key) == shard for key in shard_keys)
+        total += len(shard_keys)
+    assert total == 1000
+
+    assert cli.main(["decode", "-i", str(keys_file), "--keys"]) == 0
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split("\t") for line in lines] == [[key, str(keygen.parse_timestamp(key))] for key in keys]
+
+    assert cli.main(["decode", "--iso", "-i", str(keys_file)]) == 0
+    assert capsys.readouterr().out.split()[0] == keygen.parse_datetime(keys[0]).isoformat()
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO("not-a-key\n"))
+    assert cli.main(["decode"]) == 1
+    assert "error" in capsys.readouterr().err
+
+    # batch and chunk sizes below 1 are rejected by the parser
+    for args in [["gen", "3", "--batch", "0"], ["route", "-s", "4", "--batch", "0"], ["decode", "--batch", "-1"]]:
+        with pytest.raises(SystemExit):
+            cli.main(args)
+    with pytest.raises(SystemExit):
+        cli.main(["analyze", str(keys_file), "--chunk-size", "0"])
+    assert "must be at least 1" in capsys.readouterr().err
+
+    # a closed pipe (e.g. piped to head) ends the command quietly
+    with (tmp_path / "closed").open("w") as closed:
+        monkeypatch.setattr(sys, "stdout", _ClosedPipe(closed.fileno()))
+        assert cli.main(["gen", "100"]) == 1
+        monkeypatch.undo()
+    assert capsys.readouterr().err == ""
+
+    monkeypatch.setattr(sys, "stdin", io.StringIO("bad\n"))
+    assert cli.main(["route", "-s", "4"]) == 1
+    assert "'bad'" in capsys.readouterr().err
+
+
+class _ClosedPipe(io.StringIO):
+    """A stdout whose reader has gone away."""
+
+    def __init__(self, fd):
+        super().__init__()
+        self.fd = fd
+
+    def write(self, _text):
+        raise BrokenPipeError(32, "Broken pipe")
+
+    def fileno(self):
+        return self.fd
+
+
+def test_analyze(tmp_path, monkeypatch):
+    keygen = KeyGen.create("AN", 4)
+    micros = 1_697_654_321_123_456
+    keys = [keygen.route_key(micros + n * 600_000_000) for n in range(1_000)]
+    expected = {}
+    for key in keys:
+        shard = keygen.parse_route(key)
+        expected[shard] = expected.get(shard, 0) + 1
+
+    lines = tmp_path / "keys.txt"
+    lines.write_text("\n".join(keys) + "\n")
+    fixed = tmp_path / "keys.dat"
+    fixed.write_bytes("".join(keys).encode())
+    mixed = tmp_path / "mixed.txt"
+    mixed.write_bytes(("\r\n".join(keys[:500] + ["ANzzbad", "ANxx" + keys[0][4:]] + keygen.txkeys(10)) + "\n").encode())
+
+    for numpy in (analyze.np, None):
+        monkeypatch.setattr(analyze, "np", numpy)
+
+        for path, width in ((lines, None), (fixed, 16)):
+            for processes in (None, 2):
+                report = analyze.analyze(path, 4, width=width, chunk_size=4_000, processes=processes)
+                assert report["keys"] == report["route_keys"] == 1_000
+                assert report["invalid"] == 0
+                assert report["shards"] == dict(sorted(expected.items()))
+                assert sum(report["routes"].values()) == 1_000
+                assert report["timestamp_min"] == micros
+                assert report["timestamp_max"] == micros + 999 * 600_000_000
+                assert report["first"] == keygen.parse_datetime(keys[0]).isoformat()
+                assert sum(report["hours"].values()) == 1_000
+                assert max(report["hours"].values()) <= 6
+
+        report = analyze.analyze(mixed, 4, chunk_size=1_000)
+        assert (report["route_keys"], report["txkeys"], report["invalid"]) == (500, 10, 2)
+
+    assert len(analyze.chunk_ranges(fixed, 1_024, 16)) == 16
+    ranges = analyze.chunk_ranges(lines, 1_000)
+    assert ranges[0][0] == 0 and ranges[-1][1] == lines.stat().st_size
+    assert all(end == start for (_, end), (start, _) in zip(ranges, ranges[1:]))
+    assert all((end - start) % 17 == 0 for start, end in ranges)
+
+    output = tmp_path / "report.json"
+    assert cli.main(["analyze", str(lines), "-s", "4", "-o", str(output)]) == 0
+    assert json.loads(output.read_text())["shards"] == {str(shard): count for shard, count in sorted(expected.items())}
+
+
+def test_lease(tmp_path):
+    server = LeaseServer(3_850, 3_850 + 50 * 100 - 1, block_size=100)
+    console.log(server)
+    address = server.start(str(tmp_path / "lease.sock"))
+
+    counters = [LeasedCounter(address) for _ in range(3)]
+    keygens = [KeyGen(DomainRouter("LS", 4), counter=counter) for counter in counters]
+    micros = time.time_ns() // 1_000
+
+    def generate(keygen, out):
+        for _ in range(300):
+            out.append(keygen.txkey(micros))
+        out.extend(keygen.txkeys(200))
+
+    results = [[] for _ in keygens]
+    threads = [threading.Thread(target=generate, args=pair) for pair in zip(keygens, results)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    keys = [key for result in results for key in result]
+    assert len(keys) == 1_500
+    assert len(set(keys)) == 1_500
+    assert all(counter.leases >= 5 for counter in counters)
+
+    counts = [keygens[0].base62.decode(key[-3:]) for key in keys]
+    assert len(set(counts)) == 1_500
+    assert all(3_850 <= count < 3_850 + 5_000 for count in counts)
+
+    console.log(counters[0])
+    for counter in counters:
+        counter.close()
+    assert len(server.held) == 0
+    assert len(server.free) == 50
+
+    # one round trip per block, the blocks held by a connection are released when it goes away
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.connect(address)
+        lines = sock.makefile("rwb")
+        for request in ("LEASE", "RELEASE 1", "NOPE", ""):
+            lines.write(f"{request}\n".encode())
+            lines.flush()
+            assert lines.readline().decode().split()[0] == ("OK" if request == "LEASE" else "ERR")
+        assert len(server.held) == 1
+        lines.close()
+
+    time.sleep(0.1)
+    assert len(server.held) == 0
+    server.stop()
+
+    small = LeaseServer(3_850, 3_859, block_size=5)
+    address = small.start(("127.0.0.1", 0))
+    with LeasedCounter(address) as first, LeasedCounter(address) as second:
+        assert {first.next_count(), second.next_count()} == {3_850, 3_855}
+
+        # no block is free for the prefetch, so the counter releases its block and leases again
+        counts = [first.next_count() for _ in range(12)]
+        assert all(first.min <= count <= first.max for count in counts[-2:])
+        assert first.leases >= 3
+
+        # a client that holds nothing waits for a released block instead of failing
+        waiting = []
+        thread = threading.Thread(target=lambda: waiting.append(LeasedCounter(address)))
+        thread.start()
+        time.sleep(0.1)
+        assert not waiting
+        second.close()
+        thread.join()
+        assert waiting[0].min == second.min
+        waiting[0].close()
+    small.stop()
+
+    # more clients than blocks all get served, one block at a time
+    crowded = LeaseServer(3_850, 3_850 + 8 * 200 - 1, block_size=200)
+    address = crowded.start(str(tmp_path / "crowded.sock"))
+    results = [[] for _ in range(20)]
+
+    def lease_keys(out):
+        with LeasedCounter(address) as counter:
+            keygen = KeyGen(DomainRouter("LS", 4), counter=counter)
+            for _ in range(5):
+                out.extend(keygen.txkeys(200))
+
+    threads = [threading.Thread(target=lease_keys, args=(out,)) for out in results]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    keys = [key for result in results for key in result]
+    assert len(keys) == 20_000
+    assert len(set(keys)) == 20_000
+    assert len(crowded.held) == 0
+    crowded.stop()
+
+
+def test_lease_stop(tmp_path, caplog):
+    # stopping the server hangs up on connected and waiting clients before its loop closes
+    server = LeaseServer(3_850, 3_859, block_size=10)
+    address = server.start(str(tmp_path / "stop.sock"))
+    counter = LeasedCounter(address)
+    errors = []
+
+    def wait_for_block():
+        try:
+            LeasedCounter(address)
+        except (ConnectionError, RuntimeError) as err:
+            errors.append(err)
+
+    thread = threading.Thread(target=wait_for_block)
+    thread.start()
+    time.sleep(0.1)
+    server.stop()
+    thread.join()
+    gc.collect()
+
+    assert len(errors) == 1
+    assert not [record for record in caplog.records if record.name == "asyncio"]
+    with pytest.raises(ConnectionError):
+        counter.next_counts(20)
+
+    with pytest.raises(ValueError):
+        LeaseServer(0, 10, block_size=20)
+
+
+def test_counter_state(tmp_path, monkeypatch):
+    path = tmp_path / "keygen.state"
+    state = CounterState(path, interval=100)
+    console.log(state)
+    assert state.saved is None
+    keygen = KeyGen(DomainRouter("ST", 1), counter=Counter(3_850, 238_000, 5_000), state=state)
+
+    keys = [keygen.txkey() for _ in range(250)]
+    assert state.pending == 50
+    assert (state.timestamp, state.count) == (keygen.parse_timestamp(keys[-1]), 5_250)
+
+    # a crash before close leaves the last checkpoint, 200 keys in, in the file
+    crashed = CounterState(path)
+    assert crashed.saved == (keygen.parse_timestamp(keys[199]), 5_200, 100)
+    restarted = KeyGen(DomainRouter("ST", 1), state=crashed)
+    assert restarted.counter.next_count() == 5_301
+    crashed.close()
+
+    keys += keygen.txkeys(1_000)
+    state.close()
+    state.close()
+
+    with CounterState(path) as saved:
+        assert saved.saved == (keygen.parse_timestamp(keys[-1]), keygen.counter.count, 100)
+        restarted = KeyGen(DomainRouter("ST", 1), counter=Counter(3_850, 238_000), state=saved)
+        assert restarted.counter.count == keygen.counter.count + 100
+
+    # a saved high-water mark ahead of the clock, e.g. after the clock stepped back
+    future = time.time_ns() // 1_000 + 60_000_000
+    with CounterState(path) as ahead:
+        ahead.record(future, 3_900)
+
+    keygen = KeyGen.create("ST", state=path, monotonic=True)
+    keys = [keygen.txkey() for _ in range(10)] + keygen.txkeys(10)
+    assert all(keygen.parse_timestamp(key) > future for key in keys)
+    assert keys == sorted(keys)
+    assert keygen.compile() == keygen.route_key
+    keygen.state.close()
+
+    # monotonic txkeys(1) moves the timestamp on a microsecond per call, so with a frozen clock a
+    # crash leaves up to interval microseconds of issued keys past the checkpoint
+    micros = time.time_ns() // 1_000
+    monkeypatch.setattr(time, "time_ns", lambda: micros * 1_000)
+    crash_path = tmp_path / "crash.state"
+    keygen = KeyGen.create("ST", state=crash_path, monotonic=True)
+    keys = [keygen.txkeys(1)[0] for _ in range(6_000)]
+
+    restarted = KeyGen.create("ST", state=crash_path, monotonic=True)
+    assert restarted.state.saved[0] < keygen.parse_timestamp(keys[-1])
+    assert restarted.txkeys(1)[0] > keys[-1]
+    assert restarted.txkey() > keys[-1]
+    restarted.state.close()
+    keygen.state.close()
+
+    with pytest.raises(ValueError):
+        CounterState(path, interval=0)
+
+
+def test_strict_validation():
+    keygen = KeyGen.create("VA", 4)
+    key = keygen.route_key()
+    assert keygen.is_valid_route_key(key, strict=True)
+    assert keygen.is_valid_route_key("VAzz!!!!!!!!!!!!")
+    assert not keygen.is_valid_route_key("VAzz!!!!!!!!!!!!", strict=True)
+
+    invalid = [
+        "VA" + "zz" + key[4:],  # non-hex route
+        "VA+f" + key[4:],  # int() would accept it
+        key[:8] + "!" + key[9:],  # not in the alphabet
+        key[:4] + "000000000" + key[13:],  # timestamp 0
+        "VA00" + keygen.txkey(time.time_ns() // 1_000 + 2 * domkeys.MAX_CLOCK_SKEW),  # from the future
+        "XX" + key[2:],
+        key[:-1],
+        None,
+    ]
+    assert not any(keygen.is_valid_route_key(bad, strict=True) for bad in invalid)
+    assert keygen.is_valid_route_key("VA0A" + key[4:], strict=True)
+    keygen.parse_route("VA0A" + key[4:])
+
+    keys = keygen.route_keys(10_000)
+    stream = [bad for pair in zip(keys, invalid * 1_250) for bad in pair]
+    assert list(keygen.is_valid_many(stream)) == [True, False] * 10_000
+    assert list(keygen.filter_valid(iter(stream))) == keys
+    assert list(keygen.is_valid_many(stream, strict=False)) == [keygen.is_valid_route_key(k) for k in stream]
+
+    # unsorted alphabets compare decoded timestamps
+    alphabet = string.ascii_lowercase + string.digits + string.ascii_uppercase
+    shuffled = KeyGen(DomainRouter("VA", 4), base62=Base62(alphabet))
+    keys = shuffled.route_keys(100)
+    assert all(shuffled.is_valid_route_key(key, strict=True) for key in keys)
+    assert list(shuffled.filter_valid(keys + ["VA00" + "0" * 12])) == keys
+
+    registry = KeyGenRegistry(["VA"])
+    assert registry.is_valid_route_key(key, strict=True)
+    assert not registry.is_valid_route_key("VAzz!!!!!!!!!!!!", strict=True)
+
+
+def test_key_pool():
+    keygen = KeyGen.create("PL", 4)
+    with KeyPool(keygen, capacity=100, low_water=20, background=False) as pool:
+        console.log(pool)
+        assert len(pool) == 100
+        keys = [pool.get() for _ in range(250)]
+        assert len(set(keys)) == 250
+        assert all(keygen.is_valid_route_key(key) for key in keys)
+
+        stats = pool.stats()
+        assert stats["hits"] == 250
+        assert stats["stalls"] == 0
+        assert stats["hit_rate"] == 1.0
+        assert stats["generated"] >= 250
+
+    with KeyPool(keygen, capacity=1_000, batch_size=100) as pool:
+        keys = [pool.get() for _ in range(5_000)]
+        keys += asyncio.run(_aget_keys(pool, 1_000))
+        assert len(set(keys)) == 6_000
+
+        stats = pool.stats()
+        assert stats["hits"] + stats["stalls"] == 6_000
+        assert stats["refills"] > 1
+
+    # a closed pool falls back to inline refills
+    keys = [pool.get() for _ in range(2_000)]
+    assert len(set(keys)) == 2_000
+
+    with pytest.raises(ValueError):
+        KeyPool(keygen, capacity=10, low_water=10)
+
+    # the background thread is only woken below low water, so it must be at least 1
+    with pytest.raises(ValueError):
+        KeyPool(keygen, capacity=10, low_water=0)
+    with KeyPool(keygen, capacity=10, low_water=0, background=False) as pool:
+        assert len({pool.get() for _ in range(25)}) == 25
+
+    # aget never generates keys on the event loop thread, even without a background thread
+    threaded = _ThreadedKeyGen(DomainRouter("PL", 4))
+    with KeyPool(threaded, capacity=100, low_water=20, background=False) as pool:
+        threaded.threads.clear()
+        keys = asyncio.run(_aget_keys(pool, 250))
+        assert len(set(keys)) == 250
+        stats = pool.stats()
+        assert stats["hits"] + stats["stalls"] == 250
+        assert stats["generated"] <= 100 + 250
+        assert threaded.threads
+        assert threading.get_ident() not in threaded.threads
+
+    # the aget that crosses low water gets its key without waiting for the refill
+    threaded.delay = 0.2
+    with KeyPool(threaded, capacity=100, low_water=20, background=False) as pool:
+        keys = asyncio.run(_aget_timed(pool, 81))
+        assert keys.pop() < 0.1
+        assert len(set(keys)) == 81
+
+
+class _ThreadedKeyGen(KeyGen):
+    """A KeyGen that records the threads generating its route keys."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.threads = set()
+        self.delay = 0.0
+
+    def route_keys(self, count):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return super().route_keys(count)
+
+
+async def _aget_keys(pool, count):
+    return [await pool.aget() for _ in range(count)]
+
+
+async def _aget_timed(pool, count):
+    """Return count keys followed by the seconds taken by the last aget."""
+    keys = [await pool.aget() for _ in range(count - 1)]
+    start = time.perf_counter()
+    keys.append(await pool.aget())
+    return [*keys, time.perf_counter() - start]
+
+
 if __name__ == "__main__":
     args = sys.argv[1:]
 